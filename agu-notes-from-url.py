@@ -1,169 +1,2470 @@
 import regex as re
 import time
-from os import path, rename, remove, chdir, makedirs
+import json
+import hashlib
+import argparse
+import sqlite3
+import itertools
+import random
+import multiprocessing
+import shutil
+import subprocess
+import tempfile
+from uuid import uuid4
+from os import path, rename, remove, chdir, makedirs, replace, scandir, utime, getpid
+from os import fsync, getcwd, sysconf
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from zipfile import ZipFile
+from zipfile import ZipFile, ZIP_DEFLATED
 import sys
+import asyncio
+import atexit
+import signal
 from configparser import ConfigParser
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager, redirect_stdout
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from queue import LifoQueue
+from threading import Event, Lock, Thread, get_ident, local
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit, urlunsplit
 
-from selenium import webdriver
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
-from selenium.common.exceptions import TimeoutException
-from selenium.webdriver.chrome.service import Service
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Slow-to-import modules (selenium, websocket, icalendar, urllib.request) are imported
+# where they're used, so that e.g. --plan starts quickly
 
 delay = 10  # timeout, seconds
+HTTP_USER_AGENT = "Mozilla/5.0 (compatible; agu-notes-from-url)"
+
+browser_manager = None
+page_cache = None
+state_store = None
+archive_pack = None
+tracer = None
+journal = None
+fetch_policy = None
+people_index = None
+filename_allocator = None
+offline = False  # Set by --offline: only read pages from the cache
+INDENT = 4 * " "
+
+
+MAX_FILENAME_BYTES = 255  # Most filesystems' limit on the length of a file's name
+# Room kept in notes' names for the time stamp added to them when they're archived
+ARCHIVE_STAMP_BYTES = len(" YYYYmmddHHMMSS")
+
+
+def shorten_name(name, max_bytes):
+    """
+    Shorten name to at most max_bytes bytes (in UTF-8) by replacing words from the end
+    with " …"
+    """
+    if len(name.encode()) <= max_bytes:
+        return name
+    budget = max_bytes - len(" …".encode())
+    words = name.split(" ")
+    n_words = 0
+    n_bytes = -1  # No space before the first word
+    for word in words:
+        n_bytes += 1 + len(word.encode())
+        if n_bytes > budget:
+            break
+        n_words += 1
+    if n_words:
+        return " ".join(words[:n_words]) + " …"
+    # Even the first word is too long, so cut it (at a character boundary)
+    return name.encode()[:budget].decode(errors="ignore") + " …"
+
+
+def resource_path(relative_path: str) -> str:
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = path.dirname(__file__)
+    return path.join(base_path, relative_path)
+
+
+# Set defaults
+thisYear = datetime.now().year
+debug = False
+overwrite = False
+filter_date = None  # Optional date to filter events
+workers = 1  # Number of pages to fetch and extract at once
+processes = 1  # Number of processes to split sessions between, each with browsers
+backend = "selenium"  # How to read pages: "selenium", "cdp" or "http"
+chrome_path = None  # Chrome to use with backend = cdp (default: found automatically)
+lean_browser = False  # Whether browsers skip loading images, fonts, trackers, etc.
+browser_max_pages = 200  # Restart a browser after this many pages loaded (0: never)
+browser_max_rss_mb = 1500.0  # ...or once it uses this much memory (0: no limit)
+# Maximum pages being fetched/extracted/rendered at once (defaults set below)
+fetch_concurrency = None
+extract_concurrency = None
+render_concurrency = 1
+use_cache = False  # Whether to cache what's read from each page
+cache_dir = path.join(path.expanduser("~"), ".cache", "agu-notes-from-url")
+cache_ttl_hours = 24.0  # Cached pages older than this are read again
+cache_max_mb = 200.0  # Least-recently-used pages are dropped beyond this
+incremental = False  # Only re-read stale pages, and only rewrite changed notes
+incremental_stale_hours = 6.0  # Pages read more recently than this aren't re-read
+state_db = ".agu-notes-state.sqlite"  # Where incremental mode keeps track of pages
+profile = False  # Whether to time what the run spends its time on
+profile_file = "agu-notes-trace.json"  # Where profile = true saves its timings
+journal_file = ".agu-notes-journal.jsonl"  # Where each URL's progress is recorded
+retries = 2  # How many times to retry loading a page that failed or timed out
+retry_backoff_seconds = 2.0  # Wait about this long before the first retry, then 2x...
+max_requests_per_second = 0.0  # Most pages to load per second from a site (0: no limit)
+# Pause all page loads for breaker_pause_seconds if at least breaker_failure_rate of
+# the last breaker_window loads failed
+breaker_failure_rate = 0.5
+breaker_window = 20
+breaker_pause_seconds = 60.0
+archive = "note"  # How to archive replaced notes: "note" (a zip per note) or "pack"
+archive_file = "ARCHIVE.zip"  # The single zip file used with archive = pack
+people_notes = False  # Whether to keep a note for each person and institution
+
+
+def read_settings(settings_file="settings.ini"):
+    """
+    Read settings.ini (if there is one) into this module's settings, and go to the
+    output location
+    """
+    global thisYear, debug, overwrite, filter_date, workers, processes, backend
+    global lean_browser, browser_max_pages, browser_max_rss_mb, chrome_path
+    global fetch_concurrency, extract_concurrency, render_concurrency
+    global use_cache, cache_dir, cache_ttl_hours, cache_max_mb
+    global incremental, incremental_stale_hours, state_db
+    global archive, archive_file, profile, profile_file, journal_file
+    global retries, retry_backoff_seconds, max_requests_per_second
+    global breaker_failure_rate, breaker_window, breaker_pause_seconds, people_notes
+    if path.exists(settings_file):
+        config = ConfigParser()
+        config.read(settings_file)
+        if config.has_option("optional", "year"):
+            thisYear = config.get("optional", "year")
+            thisYear = int(thisYear)
+        if config.has_option("optional", "output_location"):
+            outDir = config.get("optional", "output_location")
+            if not path.exists(outDir):
+                makedirs(outDir)
+            chdir(outDir)
+        if config.has_option("optional", "debug"):
+            debug = config.get("optional", "debug").lower() == "true"
+        if config.has_option("optional", "overwrite"):
+            overwrite = config.get("optional", "overwrite").lower() == "true"
+        if config.has_option("optional", "workers"):
+            workers = config.getint("optional", "workers")
+            if workers < 1:
+                raise ValueError(f"workers must be at least 1, not {workers}")
+        if config.has_option("optional", "processes"):
+            processes = config.getint("optional", "processes")
+            if processes < 1:
+                raise ValueError(f"processes must be at least 1, not {processes}")
+        if config.has_option("optional", "backend"):
+            backend = config.get("optional", "backend").lower()
+            if backend not in ["selenium", "cdp", "http"]:
+                raise ValueError(
+                    f"backend must be selenium, cdp or http, not {backend}"
+                )
+        if config.has_option("optional", "chrome_path"):
+            chrome_path = config.get("optional", "chrome_path")
+        if config.has_option("optional", "lean_browser"):
+            lean_browser = config.get("optional", "lean_browser").lower() == "true"
+        if config.has_option("optional", "browser_max_pages"):
+            browser_max_pages = config.getint("optional", "browser_max_pages")
+        if config.has_option("optional", "browser_max_rss_mb"):
+            browser_max_rss_mb = config.getfloat("optional", "browser_max_rss_mb")
+        if config.has_option("optional", "people_notes"):
+            people_notes = config.get("optional", "people_notes").lower() == "true"
+        if config.has_option("optional", "fetch_concurrency"):
+            fetch_concurrency = config.getint("optional", "fetch_concurrency")
+        if config.has_option("optional", "extract_concurrency"):
+            extract_concurrency = config.getint("optional", "extract_concurrency")
+        if config.has_option("optional", "render_concurrency"):
+            render_concurrency = config.getint("optional", "render_concurrency")
+        if config.has_option("optional", "cache"):
+            use_cache = config.get("optional", "cache").lower() == "true"
+        if config.has_option("optional", "cache_dir"):
+            cache_dir = config.get("optional", "cache_dir")
+            cache_dir = path.abspath(path.expanduser(cache_dir))
+        if config.has_option("optional", "cache_ttl_hours"):
+            cache_ttl_hours = config.getfloat("optional", "cache_ttl_hours")
+        if config.has_option("optional", "cache_max_mb"):
+            cache_max_mb = config.getfloat("optional", "cache_max_mb")
+        if config.has_option("optional", "incremental"):
+            incremental = config.get("optional", "incremental").lower() == "true"
+        if config.has_option("optional", "incremental_stale_hours"):
+            incremental_stale_hours = config.getfloat(
+                "optional", "incremental_stale_hours"
+            )
+        if config.has_option("optional", "state_db"):
+            state_db = config.get("optional", "state_db")
+            state_db = path.abspath(path.expanduser(state_db))
+        if config.has_option("optional", "archive"):
+            archive = config.get("optional", "archive").lower()
+            if archive not in ["note", "pack"]:
+                raise ValueError(f"archive must be note or pack, not {archive}")
+        if config.has_option("optional", "archive_file"):
+            archive_file = config.get("optional", "archive_file")
+            archive_file = path.abspath(path.expanduser(archive_file))
+        if config.has_option("optional", "profile"):
+            profile = config.get("optional", "profile").lower() == "true"
+        if config.has_option("optional", "profile_file"):
+            profile_file = config.get("optional", "profile_file")
+            profile_file = path.abspath(path.expanduser(profile_file))
+        if config.has_option("optional", "journal_file"):
+            journal_file = config.get("optional", "journal_file")
+            journal_file = path.abspath(path.expanduser(journal_file))
+        if config.has_option("optional", "retries"):
+            retries = config.getint("optional", "retries")
+        if config.has_option("optional", "retry_backoff_seconds"):
+            retry_backoff_seconds = config.getfloat("optional", "retry_backoff_seconds")
+        if config.has_option("optional", "max_requests_per_second"):
+            max_requests_per_second = config.getfloat(
+                "optional", "max_requests_per_second"
+            )
+        if config.has_option("optional", "breaker_failure_rate"):
+            breaker_failure_rate = config.getfloat("optional", "breaker_failure_rate")
+        if config.has_option("optional", "breaker_window"):
+            breaker_window = config.getint("optional", "breaker_window")
+        if config.has_option("optional", "breaker_pause_seconds"):
+            breaker_pause_seconds = config.getfloat("optional", "breaker_pause_seconds")
+        if config.has_option("optional", "date"):
+            date_str = config.get("optional", "date")
+            try:
+                filter_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+            except ValueError as e:
+                raise ValueError(
+                    f"Invalid date (expected format YYYY-MM-DD): {date_str}"
+                ) from e
+            except Exception as e:
+                raise RuntimeError("Error parsing date from settings") from e
+    if fetch_concurrency is None:
+        fetch_concurrency = workers
+    if extract_concurrency is None:
+        extract_concurrency = workers
+    for limit in [fetch_concurrency, extract_concurrency, render_concurrency]:
+        if limit < 1:
+            raise ValueError(f"Concurrency settings must be at least 1, not {limit}")
+    if retries < 0:
+        raise ValueError(f"retries must be at least 0, not {retries}")
+    if breaker_window < 1:
+        raise ValueError(f"breaker_window must be at least 1, not {breaker_window}")
+
+
+def get_tz(this_year):
+    if this_year in [2022]:
+        tz = "America/Chicago"
+    elif this_year in [2023]:
+        tz = "US/Pacific"
+    elif this_year in [2024]:
+        tz = "US/Eastern"
+    elif this_year in [2025]:
+        tz = "US/Central"
+    else:
+        raise KeyError(f"What time zone for AGU {this_year}?")
+    return tz
+
+
+class Tracer:
+    """
+    Timings of what a run spends its time on ("spans"), for profile = true. Saved as a
+    Chrome trace-event file, which can be opened in https://ui.perfetto.dev or
+    chrome://tracing.
+    """
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.events = []
+        self.lock = Lock()
+
+    @contextmanager
+    def span(self, name, **args):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            end_time = time.perf_counter()
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": round((start_time - self.start_time) * 1e6),
+                "dur": round((end_time - start_time) * 1e6),
+                "pid": getpid(),
+                "tid": get_ident(),
+                "args": {k: v for k, v in args.items() if v is not None},
+            }
+            with self.lock:
+                self.events.append(event)
+
+    def save(self, trace_file):
+        with self.lock:
+            events = list(self.events)
+        with open(trace_file, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def summary(self):
+        """
+        Table of how many times each kind of span happened and how long they took
+        """
+        seconds = defaultdict(list)
+        with self.lock:
+            for event in self.events:
+                seconds[event["name"]].append(event["dur"] / 1e6)
+        rows = sorted(seconds.items(), key=lambda x: sum(x[1]), reverse=True)
+        lines = [f"{'Span':<16} {'Count':>6} {'Total s':>9} {'Mean s':>8} {'Max s':>8}"]
+        for name, times in rows:
+            lines.append(
+                f"{name:<16} {len(times):>6} {sum(times):>9.2f}"
+                f" {sum(times) / len(times):>8.3f} {max(times):>8.3f}"
+            )
+        return "\n".join(lines)
+
+
+def get_tracer():
+    """
+    Get the Tracer for this run, making it if needed. None unless profile = true.
+    """
+    global tracer
+    if tracer is None and profile:
+        tracer = Tracer()
+    return tracer
+
+
+@contextmanager
+def span(name, url=None, session=None, **args):
+    """
+    Time a block of code as a span named name, tagged with the page's URL and session
+    code if known. Does nothing unless profile = true.
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        yield
+        return
+    with tracer.span(name, url=url, session=session, **args):
+        yield
+
+
+# With lean_browser = true, Chrome is started with these flags, to leave out what isn't
+# needed to read a page: images, background services, and a renderer process for each
+# site's iframes
+LEAN_BROWSER_ARGS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-extensions",
+    "--disable-features=Translate,OptimizationHints,MediaRouter",
+    "--disable-gpu",
+    "--disable-site-isolation-trials",
+    "--disable-sync",
+    "--mute-audio",
+    "--no-first-run",
+]
+# ...and requests for these are blocked. Stylesheets aren't: what's read from a page is
+# its text as laid out (innerText), which they change. Scripts other than known
+# trackers aren't either, since the meeting app needs them to show anything.
+LEAN_BLOCKED_URLS = [
+    # Images, fonts and media
+    "*.png*",
+    "*.jpg*",
+    "*.jpeg*",
+    "*.gif*",
+    "*.webp*",
+    "*.svg*",
+    "*.ico*",
+    "*.woff*",
+    "*.ttf*",
+    "*.otf*",
+    "*.eot*",
+    "*.mp4*",
+    "*.webm*",
+    # Analytics and other trackers
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*hotjar.com*",
+    "*nr-data.net*",
+    "*newrelic.com*",
+]
+
+
+class CdpBrowser:
+    """
+    Chrome controlled directly through its DevTools websocket (backend = cdp), instead
+    of through chromedriver, which adds an HTTP request to every command. Has the few
+    WebDriver methods this script uses.
+    """
+
+    def __init__(self, chrome, args=()):
+        import urllib.request
+        import websocket
+
+        self.user_data_dir = tempfile.mkdtemp(prefix="agu-notes-chrome-")
+        self.process = subprocess.Popen(
+            [
+                chrome,
+                "--remote-debugging-port=0",
+                f"--user-data-dir={self.user_data_dir}",
+                "--no-first-run",
+                "--no-default-browser-check",
+                *args,
+                "about:blank",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self.ws = None
+        self.ids = itertools.count(1)
+        self.events = set()  # Methods of the events received since the last get()
+        self.script_timeout = 30.0
+        try:
+            port = self._wait_for_port()
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/json/list") as r:
+                targets = json.load(r)
+            page = next(t for t in targets if t["type"] == "page")
+            self.ws = websocket.create_connection(
+                page["webSocketDebuggerUrl"], suppress_origin=True
+            )
+            self.execute_cdp_cmd("Page.enable", {})
+        except:
+            self.quit()
+            raise
+
+    def _wait_for_port(self, timeout=30.0):
+        """
+        Wait for Chrome to say which port it's listening for DevTools on
+        """
+        port_file = path.join(self.user_data_dir, "DevToolsActivePort")
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Chrome exited with code {self.process.returncode}")
+            try:
+                with open(port_file) as f:
+                    port = f.readline().strip()
+                if port:
+                    return int(port)
+            except FileNotFoundError:
+                pass
+            time.sleep(0.05)
+        raise TimeoutError("Chrome didn't start listening for DevTools in time")
+
+    def _receive(self, deadline, what):
+        import websocket
+
+        self.ws.settimeout(max(0.01, deadline - time.monotonic()))
+        try:
+            message = json.loads(self.ws.recv())
+        except websocket.WebSocketTimeoutException:
+            raise TimeoutError(f"Timed out waiting for {what}") from None
+        if "method" in message:
+            self.events.add(message["method"])
+        return message
+
+    def execute_cdp_cmd(self, cmd, cmd_args, timeout=60.0):
+        message_id = next(self.ids)
+        self.ws.send(json.dumps({"id": message_id, "method": cmd, "params": cmd_args}))
+        deadline = time.monotonic() + timeout
+        while True:
+            # Replies to commands that timed out earlier are skipped
+            message = self._receive(deadline, cmd)
+            if message.get("id") == message_id:
+                break
+        if "error" in message:
+            raise RuntimeError(f"{cmd} failed: {message['error'].get('message')}")
+        return message.get("result", {})
+
+    def get(self, url, timeout=60.0):
+        """
+        Load url, returning once its HTML has been parsed (DOMContentLoaded), without
+        waiting for images, etc. as WebDriver does
+        """
+        self.events.clear()
+        result = self.execute_cdp_cmd("Page.navigate", {"url": url}, timeout)
+        if result.get("errorText"):
+            raise RuntimeError(f"Couldn't load {url}: {result['errorText']}")
+        deadline = time.monotonic() + timeout
+        while "Page.domContentEventFired" not in self.events:
+            self._receive(deadline, f"{url} to load")
+
+    def set_script_timeout(self, seconds):
+        self.script_timeout = seconds
+
+    def _evaluate(self, expression, timeout=60.0):
+        params = {"expression": expression, "awaitPromise": True, "returnByValue": True}
+        result = self.execute_cdp_cmd("Runtime.evaluate", params, timeout)
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            error = details.get("exception", {}).get("description") or details["text"]
+            raise RuntimeError(f"JavaScript error: {error}")
+        return result["result"].get("value")
+
+    def execute_script(self, script, *args):
+        expression = "(function () {%s}).apply(null, %s)" % (script, json.dumps(args))
+        return self._evaluate(expression)
+
+    def execute_async_script(self, script, *args):
+        # Like WebDriver, the script is given a callback to call with its result as its
+        # last argument
+        expression = (
+            "new Promise((resolve) => (function () {%s})"
+            ".apply(null, %s.concat([resolve])))" % (script, json.dumps(args))
+        )
+        return self._evaluate(expression, self.script_timeout)
+
+    def quit(self):
+        if self.ws:
+            try:
+                self.ws.close()
+            except:
+                pass
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+
+def find_chrome():
+    """
+    Get the path of Chrome (for backend = cdp): chrome_path if set, otherwise one
+    that's installed, otherwise the Chrome for Testing that Selenium downloads
+    """
+    global chrome_path
+    if not chrome_path:
+        for name in ["google-chrome", "google-chrome-stable", "chromium", "chrome"]:
+            chrome_path = shutil.which(name)
+            if chrome_path:
+                break
+        else:
+            from selenium.webdriver.common.selenium_manager import SeleniumManager
+
+            paths = SeleniumManager().binary_paths(["--browser", "chrome"])
+            chrome_path = paths["browser_path"]
+    return chrome_path
+
+
+def start_browser(tz):
+    with span("start_browser"):
+        if backend == "cdp":
+            args = [] if debug else ["--headless=new"]  # Invisible window
+            if lean_browser:
+                args += LEAN_BROWSER_ARGS
+            browser = CdpBrowser(find_chrome(), args)
+        else:
+            browser = start_webdriver()
+
+        # Every new browser, including ones that replace restarted ones, gets these
+        tz_params = {"timezoneId": tz}
+        browser.execute_cdp_cmd("Emulation.setTimezoneOverride", tz_params)
+        if lean_browser:
+            browser.execute_cdp_cmd("Network.enable", {})
+            blocked = {"urls": LEAN_BLOCKED_URLS}
+            browser.execute_cdp_cmd("Network.setBlockedURLs", blocked)
+    return browser
+
+
+def start_webdriver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    # Selenium will download the necessary version of Chrome For Testing
+    service = Service()
+    options = webdriver.ChromeOptions()
+    if not debug:
+        options.add_argument("--headless")  # Invisible window
+    if lean_browser:
+        for arg in LEAN_BROWSER_ARGS:
+            options.add_argument(arg)
+        # Don't even keep images that get through in the cache
+        images_setting = "profile.managed_default_content_settings.images"
+        options.add_experimental_option("prefs", {images_setting: 2})
+    return webdriver.Chrome(service=service, options=options)
+
+
+def tree_rss_bytes(root_pids):
+    """
+    Resident memory of each of root_pids' processes and all their descendants, as {pid:
+    bytes}. Empty where that can't be found out (anywhere but Linux).
+    """
+    if not path.isdir("/proc"):
+        return {}
+    page_size = sysconf("SC_PAGE_SIZE")
+    children = defaultdict(list)
+    rss = {}
+    for entry in scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue  # Exited
+        # The fields after the command (which can contain spaces) in parentheses
+        fields = stat[stat.rindex(")") + 2 :].split()
+        children[int(fields[1])].append(int(entry.name))
+        rss[int(entry.name)] = int(fields[21]) * page_size
+    result = {}
+    for root_pid in root_pids:
+        total = 0
+        todo = [root_pid]
+        while todo:
+            pid = todo.pop()
+            total += rss.get(pid, 0)
+            todo.extend(children[pid])
+        result[root_pid] = total
+    return result
+
+
+class MemoryWatchdog(Thread):
+    """
+    Every few seconds, measures how much memory each of a BrowserManager's browsers
+    (with all of Chrome's processes) uses, and the whole run's peak
+    """
+
+    def __init__(self, manager, interval_seconds=2.0):
+        super().__init__(daemon=True)
+        self.manager = manager
+        self.interval_seconds = interval_seconds
+        self.stopped = Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.manager.sample_memory()
+            self.stopped.wait(self.interval_seconds)
+
+    def stop(self):
+        self.stopped.set()
+
+
+def browser_pid(browser):
+    """
+    The process ID of a browser's chromedriver, whose children are Chrome's processes
+    (or of Chrome itself, with backend = cdp)
+    """
+    if isinstance(browser, CdpBrowser):
+        return browser.process.pid
+    try:
+        return browser.service.process.pid
+    except AttributeError:
+        return None
+
+
+browser_waits = local()  # Seconds each thread has waited for a free browser
+
+
+class BrowserManager:
+    """
+    Owns every browser this script starts. Idle browsers are reused instead of
+    launching a new one; at most `max_browsers` are open at once. A browser is
+    restarted once it's loaded `max_pages` pages or uses more than `max_rss_mb` of
+    memory, since Chrome's memory use keeps growing the more pages it loads.
+    """
+
+    def __init__(self, tz, max_browsers, max_pages=0, max_rss_mb=0.0):
+        self.tz = tz
+        self.max_browsers = max_browsers
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.browsers = []
+        # Idle browsers, and None for each slot a browser was restarted in
+        self.idle = LifoQueue()
+        self.lock = Lock()
+        self.launches = 0
+        self.launch_seconds = 0.0
+        self.borrows = 0
+        self.wait_seconds = 0.0
+        self.pages = Counter()  # id(browser): pages it's loaded
+        self.rss = {}  # id(browser): bytes of memory it used when last sampled
+        self.peak_rss = 0  # Most memory used by this process and all its browsers
+        self.recycles = Counter()  # Why browsers were restarted: times
+        self.watchdog = None
+
+    def acquire(self):
+        start_time = time.perf_counter()
+        with self.lock:
+            start_new = self.idle.empty() and len(self.browsers) < self.max_browsers
+            if start_new:
+                # Reserve the slot now so other threads don't start one too
+                self.browsers.append(None)
+        if not start_new:
+            browser = self.idle.get()
+            waited = time.perf_counter() - start_time
+            browser_waits.seconds = getattr(browser_waits, "seconds", 0.0) + waited
+            with self.lock:
+                self.wait_seconds += waited
+                if browser is not None:
+                    self.borrows += 1
+            if browser is not None:
+                return browser
+            # Otherwise this is a restarted browser's slot, already reserved
+        try:
+            # Each new browser gets the time zone override, etc. from start_browser()
+            browser = start_browser(self.tz)
+        except:
+            # Let the next page try again
+            self.idle.put(None)
+            raise
+        with self.lock:
+            self.browsers[self.browsers.index(None)] = browser
+            self.borrows += 1  # Only browsers handed out count
+            self.launches += 1
+            self.launch_seconds += time.perf_counter() - start_time
+            if self.watchdog is None and path.isdir("/proc"):
+                self.watchdog = MemoryWatchdog(self)
+                self.watchdog.start()
+        return browser
+
+    def count_page(self, browser):
+        """
+        Count a page load in browser (including retries), toward restarting it after
+        max_pages
+        """
+        with self.lock:
+            self.pages[id(browser)] += 1
+
+    def release(self, browser):
+        with self.lock:
+            reason = self.recycle_reason(browser)
+            if reason:
+                self.recycles[reason] += 1
+                self.browsers[self.browsers.index(browser)] = None
+                del self.pages[id(browser)]
+                self.rss.pop(id(browser), None)
+        if not reason:
+            self.idle.put(browser)
+            return
+        if debug:
+            print(f"Restarting a browser ({reason})")
+        try:
+            browser.quit()
+        except:
+            pass
+        self.idle.put(None)
+
+    def recycle_reason(self, browser):
+        """
+        Why browser should be restarted, or None if it shouldn't
+        """
+        if self.max_pages and self.pages[id(browser)] >= self.max_pages:
+            return f"after {self.max_pages} pages"
+        rss_mb = self.rss.get(id(browser), 0) / 1024**2
+        if self.max_rss_mb and rss_mb > self.max_rss_mb:
+            return f"over {self.max_rss_mb:g} MB of memory"
+        return None
+
+    def sample_memory(self):
+        with self.lock:
+            pids = {id(b): browser_pid(b) for b in self.browsers if b}
+        rss = tree_rss_bytes([getpid()] + [pid for pid in pids.values() if pid])
+        with self.lock:
+            for key, pid in pids.items():
+                if pid in rss:
+                    self.rss[key] = rss[pid]
+            self.peak_rss = max(self.peak_rss, rss.get(getpid(), 0))
+
+    @contextmanager
+    def borrow(self):
+        browser = self.acquire()
+        try:
+            yield browser
+        finally:
+            self.release(browser)
+
+    def quit_all(self):
+        with self.lock:
+            browsers = [b for b in self.browsers if b]
+            self.browsers = []
+            self.idle = LifoQueue()
+            if self.watchdog:
+                self.watchdog.stop()
+                self.watchdog = None
+        for browser in browsers:
+            try:
+                browser.quit()
+            except:
+                pass
+
+    def summary(self):
+        text = (
+            f"{self.launches} browser launch(es) taking {self.launch_seconds:.1f} s;"
+            f" {self.borrows - self.launches} reuse(s) of a warm browser"
+            f" ({self.wait_seconds:.1f} s waiting for one to be free)"
+        )
+        if self.recycles:
+            reasons = ", ".join(f"{n} {r}" for r, n in self.recycles.most_common())
+            text += f"\nRestarted {sum(self.recycles.values())} browser(s): {reasons}"
+        if self.peak_rss:
+            text += f"\nPeak memory: {self.peak_rss / 1024**2:.0f} MB"
+        return text
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.quit_all()
+
+
+def get_browser_manager(tz):
+    """
+    Get the BrowserManager for this run, making it if needed
+    """
+    global browser_manager
+    if browser_manager is None:
+        # A browser is held from when a page starts being fetched until it's been
+        # extracted, so pages wait for one when all workers' browsers are busy
+        browser_manager = BrowserManager(
+            tz, workers, browser_max_pages, browser_max_rss_mb
+        )
+        atexit.register(browser_manager.quit_all)
+    return browser_manager
+
+
+# Parse "summary" into event title and code (if any)
+def summary_to_codetitle(summary, parent_code=None):
+    # Remove extraneous information
+    summary = summary.replace("NCA5 Author\n", "")
+    if parent_code:
+        code = re.findall(parent_code + r"\-\d+ ", summary)
+    else:
+        code = re.findall(r"[\d\-A-Z]+ - ", summary)
+    if not code:
+        code = re.findall(r"^[\d\-A-Z]+ ", summary)
+    if code:
+        title = summary.replace(code[0], "")
+        code = code[0].replace(" - ", "").replace(" ", "")
+    else:
+        title = summary
+    return code, title
+
+
+# Replacements for characters that can't be in Obsidian filenames (": " becomes "—"
+# too; see codetitle_to_filename())
+FILENAME_TABLE = str.maketrans(
+    {
+        ":": "—",
+        "?": None,
+        "/": "-",
+        "\\": "-",
+        "|": "-",
+        "*": None,
+        '"': "'",
+        "<": "(",
+        ">": ")",
+    }
+)
+
+
+# Replace illegal characters for Obsidian filenames
+def codetitle_to_filename(code, title):
+    if code:
+        filename = f"{code} {title}"
+    else:
+        filename = title
+    return filename.replace(": ", ":").translate(FILENAME_TABLE)
+
+
+class FilenameAllocator:
+    """
+    Gives out the names of notes (and of sessions' folders), made with
+    codetitle_to_filename(). A name that has to be shortened to fit always gets the
+    page's ID added, so that pages whose long titles only differ after where they're
+    shortened don't get the same name, whichever is named first (or in whichever
+    process). Names given out in each folder are remembered for the rest of the run,
+    so if two pages would still get the same one (the same code and title), the
+    second gets its ID added instead of overwriting the first.
+
+    Notes made by earlier versions, which only shortened names longer than 255
+    characters (and didn't add the ID), keep their names: if a file (or session
+    folder) with the name an earlier version would have given is there, that's used.
+    """
+
+    def __init__(self):
+        self.taken = defaultdict(dict)  # Folder: {name (casefolded): key}
+        self.names = {}  # (folder, key): name
+        self.lock = Lock()
+
+    def allocate(self, folder, code, title, key, prefix="", ext=".md"):
+        """
+        Get the name for key (e.g., a page's URL) in folder ("" for the output
+        directory), to be used for a file called prefix + name + ext
+        """
+        with self.lock:
+            name = self.names.get((folder, key))
+            if name is not None:
+                return name
+            filename = codetitle_to_filename(code, title)
+            max_bytes = (
+                MAX_FILENAME_BYTES - len((prefix + ext).encode()) - ARCHIVE_STAMP_BYTES
+            )
+            taken = self.taken[folder]
+            tags = self.tags(key)
+            if len(filename.encode()) > max_bytes:
+                next(tags)  # Never the plain shortened name
+                name = self.existing_legacy_name(folder, filename, key, prefix, ext)
+            if name is None:
+                for tag in tags:
+                    suffix = f" ({tag})" if tag else ""
+                    name = shorten_name(filename, max_bytes - len(suffix.encode()))
+                    name += suffix
+                    # Case-insensitive filesystems (macOS, Windows) can't have both
+                    if taken.get(name.casefold(), key) == key:
+                        break
+            taken[name.casefold()] = key
+            self.names[(folder, key)] = name
+            return name
+
+    def existing_legacy_name(self, folder, filename, key, prefix, ext):
+        """
+        The name an earlier version gave key (see legacy_name()), if there's a note or
+        session folder with it that no other page has been given this run
+        """
+        name = legacy_name(filename, ext)
+        if self.taken[folder].get(name.casefold(), key) != key:
+            return None
+        for existing in [prefix + name + ext, name]:
+            if path.exists(path.join(folder, existing)):
+                return name
+        return None
+
+    @staticmethod
+    def tags(key):
+        """
+        What to tell apart names for key with: nothing, then its ID (the end of its
+        URL, or a hash of anything else), then numbers
+        """
+        yield None
+        if "://" in key:
+            yield key.rstrip("/").rsplit("/", 1)[-1]
+        else:
+            yield hashlib.sha256(key.encode()).hexdigest()[:8]
+        yield from itertools.count(2)
+
+
+def legacy_name(filename, ext):
+    """
+    The name that versions before FilenameAllocator gave a note: shortened, by
+    replacing words from the end with " …", only if name + ext was longer than 255
+    characters (not bytes)
+    """
+    words = filename.split(" ")
+    name = filename
+    n_words = len(words)
+    while len(name + ext) > 255 and n_words:
+        n_words -= 1
+        name = " ".join(words[:n_words]) + " …"
+    return name
+
+
+def get_filename_allocator():
+    """
+    Get the FilenameAllocator for this run, making it if needed
+    """
+    global filename_allocator
+    if filename_allocator is None:
+        filename_allocator = FilenameAllocator()
+    return filename_allocator
+
+
+def session_filename(url, code, title):
+    """
+    Get the name of a session's folder, which is also its note's name (with "_" in
+    front if it's in the folder)
+    """
+    allocator = get_filename_allocator()
+    return allocator.allocate("", code, title, normalize_url(url), prefix="_")
+
+
+def note_sibling(note_file, suffix):
+    """
+    The name of a file next to a note, with suffix (e.g., " ARCHIVE.zip") in place of
+    its ".md", shortened if that's too long (as it can be for a note named by an
+    earlier version; see FilenameAllocator)
+    """
+    sibling = note_file.replace(".md", suffix)
+    folder, name = path.split(sibling)
+    if len(name.encode()) > MAX_FILENAME_BYTES:
+        name = path.basename(note_file)[: -len(".md")]
+        name = shorten_name(name, MAX_FILENAME_BYTES - len(suffix.encode()))
+        sibling = path.join(folder, name + suffix)
+    return sibling
+
+
+def do_replace(output_file):
+    """
+    Archive a note (and remove it) before it's replaced
+    """
+    count_note("archived")
+    with span("do_replace", file=output_file):
+        pack = get_archive_pack()
+        if pack:
+            pack.add(output_file)
+            return
+        old_file = output_file.replace(
+            ".md", " " + datetime.now().strftime("%Y%m%d%H%M%S") + ".md"
+        )
+        file_archive = note_sibling(output_file, " ARCHIVE.zip")
+        # Not renamed to old_file first, since that might be too long a name (for a
+        # note named by an earlier version; see FilenameAllocator)
+        with ZipFile(file_archive, "a") as zipObj:
+            zipObj.write(output_file, arcname=old_file)
+        remove(output_file)
+
+
+class ArchivePack:
+    """
+    Old versions of notes, all in one zip file for the whole output directory instead
+    of one zip per note. Each distinct version is stored once, as objects/<hash>.md.
+    Notes are archived in batches; each batch adds an index, runs/<run>-<batch>.json,
+    listing which note each archived version was from and when it was archived.
+
+    Until its batch is written, each version is also kept on disk in this run's spool
+    directory, .<pack>.pending/<run>/, before its note is replaced. A run that's
+    killed leaves its spool behind, and the next run adds it to the pack.
+    """
+
+    def __init__(self, pack_file, batch_size=50):
+        self.pack_file = pack_file
+        self.batch_size = batch_size
+        # Unique even between processes started in the same second
+        self.run_id = "-".join(
+            [datetime.now().strftime("%Y%m%d%H%M%S"), str(getpid()), uuid4().hex[:8]]
+        )
+        self.lock = Lock()
+        self.pending = []  # (note, archived time, hash, contents)
+        self.n_batches = 0
+        self.n_archived = 0
+        self.n_duplicates = 0
+        self.n_recovered = 0
+
+        pack_dir, pack_name = path.split(pack_file)
+        self.spool_root = path.join(pack_dir, f".{pack_name}.pending")
+        self.spool_dir = path.join(self.spool_root, self.run_id)
+        makedirs(self.spool_root, exist_ok=True)
+        # Locked for as long as this run lasts, and before its spool exists, so that
+        # other runs never take it for one left by a run that was killed
+        self.spool_lock = open(self.spool_dir + ".lock", "a")
+        if fcntl:
+            fcntl.flock(self.spool_lock, fcntl.LOCK_EX)
+        makedirs(self.spool_dir)
+        self.spool_index = open(path.join(self.spool_dir, "index.jsonl"), "a")
+        self.recover()
+
+    def add(self, note_file):
+        with open(note_file, "rb") as f:
+            contents = f.read()
+        entry = (
+            path.normpath(note_file),
+            datetime.now().strftime("%Y%m%d%H%M%S"),
+            hashlib.sha256(contents).hexdigest(),
+            contents,
+        )
+        with self.lock:
+            self._spool(entry)
+            self.pending.append(entry)
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+        remove(note_file)
+
+    def _spool(self, entry):
+        """
+        Save a version to this run's spool, synced to disk
+        """
+        note, archived, digest, contents = entry
+        object_file = path.join(self.spool_dir, digest + ".md")
+        if not path.exists(object_file):
+            with open(object_file + ".tmp", "wb") as f:
+                f.write(contents)
+                f.flush()
+                fsync(f.fileno())
+            replace(object_file + ".tmp", object_file)
+        item = {"note": note, "archived": archived, "hash": digest}
+        self.spool_index.write(json.dumps(item) + "\n")
+        self.spool_index.flush()
+        fsync(self.spool_index.fileno())
+
+    def recover(self):
+        """
+        Add the versions spooled by runs that were killed before writing them
+        """
+        if fcntl is None:
+            return  # Can't tell which runs are still running
+        for run in scandir(self.spool_root):
+            if not run.is_dir() or run.name == self.run_id:
+                continue
+            try:
+                lock_file = open(run.path + ".lock")
+            except FileNotFoundError:
+                continue  # Just recovered by another run
+            with lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # Still running
+                entries = read_spool(run.path)
+                with self.lock:
+                    self.pending.extend(entries)
+                    self.n_recovered += len(entries)
+                    self._flush()
+                shutil.rmtree(run.path)
+                remove(run.path + ".lock")
+        if self.n_recovered:
+            print(
+                f"Added {self.n_recovered} old note version(s) left by interrupted"
+                f" runs to '{self.pack_file}'"
+            )
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        """
+        Write any versions not yet in the pack, and remove this run's spool
+        """
+        with self.lock:
+            if self.spool_index.closed:
+                return
+            self._flush()
+            self.spool_index.close()
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+            remove(self.spool_lock.name)
+            self.spool_lock.close()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        with notes_lock():
+            self._write_batch()
+        # Now in the pack, so the spool isn't needed
+        self.spool_index.truncate(0)
+        for spooled in scandir(self.spool_dir):
+            if spooled.name.endswith(".md"):
+                remove(spooled.path)
+
+    def _write_batch(self):
+        self.n_batches += 1
+        index = []
+        with ZipFile(self.pack_file, "a", compression=ZIP_DEFLATED) as zipObj:
+            stored = set(zipObj.namelist())
+            for note, archived, digest, contents in self.pending:
+                object_name = f"objects/{digest}.md"
+                if object_name in stored:
+                    self.n_duplicates += 1
+                else:
+                    zipObj.writestr(object_name, contents)
+                    stored.add(object_name)
+                index.append({"note": note, "archived": archived, "hash": digest})
+            zipObj.writestr(
+                f"runs/{self.run_id}-{self.n_batches:04d}.json",
+                json.dumps(index, indent=1),
+            )
+        self.n_archived += len(self.pending)
+        self.pending = []
+
+    def versions(self, note_file):
+        """
+        List (archived time, hash) of every archived version of a note, oldest first
+        """
+        note = path.normpath(note_file)
+        versions = []
+        with self.lock:
+            self._flush()
+            if not path.exists(self.pack_file):
+                return versions
+            with ZipFile(self.pack_file) as zipObj:
+                for name in zipObj.namelist():
+                    if name.startswith("runs/"):
+                        for entry in json.loads(zipObj.read(name)):
+                            if entry["note"] == note:
+                                versions.append((entry["archived"], entry["hash"]))
+        # A run killed just after writing a batch leaves it spooled to be added again
+        return sorted(set(versions))
+
+    def restore(self, note_file, archived=None):
+        """
+        Write an archived version of a note (by default the latest) next to it, as
+        "<note> <archived time>.md". Returns the name of the file written.
+        """
+        versions = self.versions(note_file)
+        if archived:
+            versions = [v for v in versions if v[0] == archived]
+        if not versions:
+            raise RuntimeError(f"No archived version of '{note_file}' found")
+        archived, digest = versions[-1]
+        with ZipFile(self.pack_file) as zipObj:
+            contents = zipObj.read(f"objects/{digest}.md")
+        restored_file = note_sibling(note_file, f" {archived}.md")
+        with open(restored_file, "wb") as f:
+            f.write(contents)
+        return restored_file
+
+    def summary(self):
+        return (
+            f"Archived {self.n_archived} old note version(s) to '{self.pack_file}'"
+            f" ({self.n_duplicates} identical to one already there)"
+        )
+
+
+def read_spool(spool_dir):
+    """
+    Read the versions in an ArchivePack spool, as (note, archived time, hash,
+    contents)
+    """
+    entries = []
+    index_file = path.join(spool_dir, "index.jsonl")
+    if not path.exists(index_file):
+        return entries
+    with open(index_file) as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue  # Cut short when its run was killed
+            with open(path.join(spool_dir, item["hash"] + ".md"), "rb") as obj:
+                contents = obj.read()
+            entries.append((item["note"], item["archived"], item["hash"], contents))
+    return entries
+
+
+def get_archive_pack():
+    """
+    Get the ArchivePack for this run, making it if needed. None unless archive = pack.
+    """
+    global archive_pack
+    if archive_pack is None and archive == "pack":
+        archive_pack = ArchivePack(archive_file)
+        atexit.register(archive_pack.close)
+    return archive_pack
+
+
+# Pages are read into plain dicts ("records") holding the text of each field that
+# get_presentation() and get_session() use. Records come either from a live browser
+# or, with backend = http, from the page's HTML fetched without a browser.
+
+HTML_VOID_TAGS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "link",
+    "meta",
+    "source",
+    "track",
+    "wbr",
+}
+HTML_BLOCK_TAGS = {
+    "address",
+    "article",
+    "aside",
+    "blockquote",
+    "dd",
+    "div",
+    "dl",
+    "dt",
+    "figcaption",
+    "figure",
+    "footer",
+    "form",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "header",
+    "hr",
+    "li",
+    "main",
+    "nav",
+    "ol",
+    "p",
+    "pre",
+    "section",
+    "table",
+    "tbody",
+    "tfoot",
+    "thead",
+    "tr",
+    "ul",
+}
+HTML_SKIP_TAGS = {"head", "noscript", "script", "style", "template"}
+HTML_SPACE_RE = re.compile(r"[ \t\n\r\f]+")
+
+
+class HtmlNode:
+    """
+    Minimal HTML element: enough to find elements by class or tag and get their text
+    """
+
+    def __init__(self, tag, attrs, parent=None):
+        self.tag = tag
+        self.attrs = dict(attrs)
+        self.classes = (self.attrs.get("class") or "").split()
+        self.parent = parent
+        self.children = []  # HtmlNodes and strings
+
+    def iter(self):
+        for child in self.children:
+            if isinstance(child, HtmlNode):
+                yield child
+                yield from child.iter()
+
+    def find_class(self, classname):
+        return [node for node in self.iter() if classname in node.classes]
+
+    def find_tag(self, tag):
+        return [node for node in self.iter() if node.tag == tag]
+
+    @property
+    def text(self):
+        """
+        Like the browser's innerText (as Selenium's .text and EXTRACT_JS_HELPERS get
+        it): one line per block element, whitespace collapsed, except non-breaking
+        spaces
+        """
+        parts = []
+        self._text_parts(parts)
+        lines = [line.strip(" ") for line in "".join(parts).split("\n")]
+        return "\n".join(line for line in lines if line).strip()
+
+    def _text_parts(self, parts):
+        if self.tag in HTML_SKIP_TAGS:
+            return
+        if self.tag == "br":
+            parts.append("\n")
+            return
+        is_block = self.tag in HTML_BLOCK_TAGS
+        if is_block:
+            parts.append("\n")
+        for child in self.children:
+            if isinstance(child, HtmlNode):
+                child._text_parts(parts)
+            else:
+                parts.append(HTML_SPACE_RE.sub(" ", child))
+        if is_block:
+            parts.append("\n")
+
+
+class HtmlTreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = HtmlNode("document", [])
+        self.current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        node = HtmlNode(tag, attrs, self.current)
+        self.current.children.append(node)
+        if tag not in HTML_VOID_TAGS:
+            self.current = node
+
+    def handle_startendtag(self, tag, attrs):
+        self.current.children.append(HtmlNode(tag, attrs, self.current))
+
+    def handle_endtag(self, tag):
+        # Close the innermost open element with this tag (and anything left unclosed
+        # inside it). Ignore stray end tags.
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+
+def parse_html(html):
+    builder = HtmlTreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def http_get(url):
+    from urllib.request import Request, urlopen
+
+    request = Request(url, headers={"User-Agent": HTTP_USER_AGENT})
+    with urlopen(request, timeout=delay) as response:
+        charset = response.headers.get_content_charset() or "utf-8"
+        return response.read().decode(charset, errors="replace")
+
+
+def html_find(node, classname):
+    """
+    Get the first element with the given class, raising ValueError if there isn't one
+    """
+    found = node.find_class(classname)
+    if not found:
+        raise ValueError(f"No element with class {classname}")
+    return found[0]
+
+
+def html_text_or_none(node, classname):
+    found = node.find_class(classname)
+    if found:
+        return found[0].text
+    return None
+
+
+def split_author_text(author_text):
+    """
+    Get (name, institution) from the text of an author's RoleListItem
+    """
+    author_split = author_text.split("\n")
+    name = author_split[1]
+    if len(author_split) > 2:
+        institution = author_split[2]
+    else:
+        institution = None
+    return name, institution
+
+
+def extract_presentation_html(html, url):
+    page = parse_html(html)
+    parent_links = html_find(page, "field_ParentList_ParentEntries").find_tag("a")
+    if not parent_links:
+        raise ValueError("No link to parent session")
+    authors = [split_author_text(x.text) for x in page.find_class("RoleListItem")]
+    return {
+        "parent_text": parent_links[0].text,
+        "parent_url": urljoin(url, parent_links[0].attrs.get("href")),
+        "title_text": html_find(page, "titleContent").text,
+        "abstract": html_text_or_none(page, "field_Abstract"),
+        "pl_summary": html_text_or_none(page, "field_ExtendedAbstract"),
+        "authors": authors,
+        "slot_date": html_find(page, "SlotDate").text,
+        "slot_time": html_find(page, "SlotTime").text,
+        "location": html_find(page, "propertyInfo").text,
+    }
+
+
+def extract_session_html(html, url):
+    page = parse_html(html)
+    whenwhere = html_find(page, "field_ParentList_SlotData")
+
+    childlist_role = page.find_class("field_ChildList_Role")
+    leaders = None
+    if childlist_role:
+        leaders = []
+        for person in childlist_role[0].find_class("RoleListItem"):
+            person_links = person.find_tag("a")
+            if not person_links:
+                raise ValueError("No name link for session leader")
+            person_affil = html_text_or_none(person, "Affiliation")
+            if person_affil:
+                person_affil = person_affil.replace("\n", "; ")
+            leaders.append((person_links[0].text, person_affil))
+
+    # Without its presentation list, the HTML can't tell a session without any from
+    # one whose list isn't there yet, so it's read in a browser instead
+    field_ChildList_PaperSlot = html_find(page, "field_ChildList_PaperSlot")
+    papers = []
+    for paper in field_ChildList_PaperSlot.find_class("entryInformation"):
+        paper_links = paper.find_tag("a")
+        if not paper_links:
+            raise ValueError("No link for paper")
+        papers.append(
+            {
+                "start_time": html_text_or_none(paper, "SlotTime") or "",
+                "number": html_text_or_none(paper, "SessionListNumber"),
+                "title": html_find(paper, "Title").text,
+                "url": urljoin(url, paper_links[0].attrs.get("href")),
+                "cancelled": html_text_or_none(paper, "cancelled"),
+            }
+        )
+
+    return {
+        "final_number": html_text_or_none(page, "finalNumber"),
+        "good_type": html_text_or_none(page, "field_GoodType"),
+        "title": html_find(page, "favoriteItem").text,
+        "slot_date": html_find(whenwhere, "SlotDate").text,
+        "slot_time": html_find(whenwhere, "SlotTime").text,
+        "location": html_find(whenwhere, "propertyInfo").text,
+        "subtitle": html_find(page, "field_SubTitle").text,
+        "leaders": leaders,
+        "papers": papers,
+    }
+
+
+# Waiting for a page to be ready is one JavaScript call: a MutationObserver re-checks
+# the page's condition each time the page changes, and it's ready once the condition
+# holds and the page has stopped changing for SETTLE_SECONDS. The browser gives up
+# after delay seconds, at which point we take what's there if the "required" part of
+# the condition holds ("partial").
+SETTLE_SECONDS = 0.5
+READY_JS = """
+const [timeoutMs, settleMs] = arguments;
+const done = arguments[arguments.length - 1];
+const has = (cls, root = document) => root.getElementsByClassName(cls).length > 0;
+const required = () => %s;
+const wanted = () => %s;
+let settleTimer = null;
+const observer = new MutationObserver(check);
+const deadline = setTimeout(
+    () => finish(required() ? (wanted() ? "ready" : "partial") : null), timeoutMs
+);
+function finish(state) {
+    observer.disconnect();
+    clearTimeout(deadline);
+    clearTimeout(settleTimer);
+    done(state);
+}
+function check() {
+    clearTimeout(settleTimer);
+    if (required() && wanted()) {
+        settleTimer = setTimeout(() => finish("ready"), settleMs);
+    }
+}
+observer.observe(
+    document.documentElement, {childList: true, subtree: true, characterData: true}
+);
+check();
+"""
+PRESENTATION_REQUIRED_JS = """(() => {
+    const parent = document.getElementsByClassName("field_ParentList_ParentEntries")[0];
+    const link = parent && parent.getElementsByTagName("a")[0];
+    return Boolean(link && link.innerText.trim());
+})()"""
+PRESENTATION_AUTHORS_JS = """(has("RoleListItem") && Array.from(
+    document.getElementsByClassName("RoleListItem")
+).every((x) => x.innerText.trim().split("\\n").length >= 2))"""
+SESSION_REQUIRED_JS = """(() => {
+    const slot = document.getElementsByClassName("field_ParentList_SlotData")[0];
+    return Boolean(slot) && has("SlotDate", slot) && has("favoriteItem")
+        && has("field_GoodType");
+})()"""
+# Every row of the session's presentations has its title, or (e.g. for a keynote) it
+# has no presentations but its leaders are there
+SESSION_CHILDREN_JS = """(() => {
+    const paperSlot = document.getElementsByClassName("field_ChildList_PaperSlot")[0];
+    if (!paperSlot) {
+        return has("RoleListItem");
+    }
+    const rows = Array.from(paperSlot.getElementsByClassName("entryInformation"));
+    return rows.length > 0 && rows.every((row) => has("Title", row));
+})()"""
+
+readiness_times = defaultdict(list)  # Page kind: [(seconds, state), ...]
+readiness_lock = Lock()
+
+
+def wait_until_ready(browser, kind, required_js, wanted_js="true"):
+    """
+    Wait up to delay seconds for the page in browser to be ready. Returns "ready",
+    "partial" (only required_js holds) or None (timed out), and records how long it
+    took.
+    """
+    from selenium.common.exceptions import TimeoutException
+
+    start_time = time.perf_counter()
+    browser.set_script_timeout(delay + 5)
+    script = READY_JS % (required_js, wanted_js)
+    try:
+        state = browser.execute_async_script(
+            script, int(delay * 1000), int(SETTLE_SECONDS * 1000)
+        )
+    except (TimeoutException, TimeoutError):  # TimeoutError: from a CdpBrowser
+        state = None
+    with readiness_lock:
+        readiness_times[kind].append((time.perf_counter() - start_time, state))
+    return state
+
+
+def readiness_summary():
+    """
+    How long pages took to be ready, for tuning delay and SETTLE_SECONDS
+    """
+    lines = []
+    with readiness_lock:
+        for kind, times in readiness_times.items():
+            seconds = sorted(t for t, _ in times)
+            n = len(seconds)
+            not_ready = sum(1 for _, state in times if state != "ready")
+            lines.append(
+                f"{kind} pages ready in: median {seconds[n // 2]:.1f} s,"
+                f" 90th percentile {seconds[min(n - 1, int(0.9 * n))]:.1f} s,"
+                f" max {seconds[-1]:.1f} s (n={n}; {not_ready} not fully ready"
+                f" within {delay} s)"
+            )
+    return "\n".join(lines)
+
+
+def wait_for_presentation(browser, url, has_abstract=True):
+    """
+    Load a Paper page in browser and wait for it to be ready. Returns its state from
+    wait_until_ready().
+    """
+    with span("browser.get", url=url):
+        browser.get(url)
+    wanted_js = PRESENTATION_AUTHORS_JS
+    if has_abstract:
+        wanted_js = f'(has("field_Abstract") && {wanted_js})'
+    with span("wait", url=url, kind="Paper"):
+        state = wait_until_ready(browser, "Paper", PRESENTATION_REQUIRED_JS, wanted_js)
+    if state is None:
+        print(f"    Loading took too much time (limit {delay} seconds). Url: {url}")
+    return state
+
+
+# Everything is read from a page loaded in a browser with a single JavaScript call,
+# rather than one WebDriver command per element. innerText is what Selenium's .text
+# gives.
+EXTRACT_JS_HELPERS = """
+const text = (el) => (el ? el.innerText.trim() : null);
+const first = (root, cls) => (root ? root.getElementsByClassName(cls)[0] : undefined);
+const all = (root, cls) => (root ? Array.from(root.getElementsByClassName(cls)) : []);
+"""
+EXTRACT_PRESENTATION_JS = EXTRACT_JS_HELPERS + """
+const parentEntries = first(document, "field_ParentList_ParentEntries");
+const parent = parentEntries && parentEntries.getElementsByTagName("a")[0];
+return {
+    parent_text: text(parent),
+    parent_url: parent ? parent.href : null,
+    title_text: text(first(document, "titleContent")),
+    abstract: text(first(document, "field_Abstract")),
+    pl_summary: text(first(document, "field_ExtendedAbstract")),
+    authors: all(document, "RoleListItem").map(text),
+    slot_date: text(first(document, "SlotDate")),
+    slot_time: text(first(document, "SlotTime")),
+    location: text(first(document, "propertyInfo")),
+};
+"""
+EXTRACT_SESSION_JS = EXTRACT_JS_HELPERS + """
+const slot = first(document, "field_ParentList_SlotData");
+const roles = first(document, "field_ChildList_Role");
+const paperSlot = first(document, "field_ChildList_PaperSlot");
+return {
+    final_number: text(first(document, "finalNumber")),
+    good_type: text(first(document, "field_GoodType")),
+    title: text(first(document, "favoriteItem")),
+    slot_date: text(first(slot, "SlotDate")),
+    slot_time: text(first(slot, "SlotTime")),
+    location: text(first(slot, "propertyInfo")),
+    subtitle: text(first(document, "field_SubTitle")),
+    leaders: roles
+        ? all(roles, "RoleListItem").map((person) => [
+            text(person.getElementsByTagName("a")[0]),
+            text(first(person, "Affiliation")),
+        ])
+        : null,
+    papers: paperSlot
+        ? all(paperSlot, "entryInformation").map((paper) => {
+            const link = paper.getElementsByTagName("a")[0];
+            return {
+                start_time: text(first(paper, "SlotTime")) || "",
+                number: text(first(paper, "SessionListNumber")),
+                title: text(first(paper, "Title")),
+                url: link ? link.href : null,
+                cancelled: text(first(paper, "cancelled")),
+            };
+        })
+        : null,
+};
+"""
+
+
+def check_record(record, required, what):
+    """
+    Raise RuntimeError if any required field of a record is missing
+    """
+    for key in required:
+        if record[key] is None:
+            raise RuntimeError(f"{what}: {key} not found!")
+
+
+def extract_presentation_selenium(browser):
+    record = browser.execute_script(EXTRACT_PRESENTATION_JS)
+    if record["parent_text"] is None:
+        raise RuntimeError("Parent session info not found!")
+    check_record(
+        record, ["title_text", "slot_date", "slot_time", "location"], "Presentation"
+    )
+
+    # Authors
+    author_texts = record["authors"]
+    record["authors"] = []
+    for author_text in author_texts:
+        try:
+            record["authors"].append(split_author_text(author_text))
+        except IndexError as e:
+            raise RuntimeError("Author info not found!") from e
+
+    return record
+
+
+def wait_for_session(browser, url, has_abstract=True):
+    """
+    Load a Session page in browser and wait for it to be ready. Returns its state from
+    wait_until_ready().
+    """
+    with span("browser.get", url=url):
+        browser.get(url)
+    with span("wait", url=url, kind="Session"):
+        state = wait_until_ready(
+            browser, "Session", SESSION_REQUIRED_JS, SESSION_CHILDREN_JS
+        )
+    if state is None:
+        print(f"Loading took too much time (limit {delay} seconds!")
+        if debug:
+            for class_name in [
+                "favoriteItem",
+                "field_ParentList_SlotData",
+                "SlotDate",
+                "field_GoodType",
+            ]:
+                found = browser.execute_script(
+                    "return document.getElementsByClassName(arguments[0]).length > 0",
+                    class_name,
+                )
+                print(f"{class_name}: {found}")
+    return state
+
+
+def extract_session_selenium(browser):
+    record = browser.execute_script(EXTRACT_SESSION_JS)
+    check_record(
+        record, ["title", "slot_date", "slot_time", "location", "subtitle"], "Session"
+    )
+    if record["leaders"] is not None:
+        leaders = []
+        for person_name, person_affil in record["leaders"]:
+            check_record({"name": person_name}, ["name"], "Session leader")
+            if person_affil:
+                person_affil = person_affil.replace("\n", "; ")
+            leaders.append((person_name, person_affil))
+        record["leaders"] = leaders
+    for paper in record["papers"] or []:
+        check_record(paper, ["title", "url"], "Paper row")
+    return record
+
+
+# Program listing pages (e.g., a day's sessions), read by --crawl for their links
+LISTING_REQUIRED_JS = "document.links.length > 0"
+LISTING_SESSIONS_JS = """Array.from(document.links).some(
+    (a) => a.href.includes("/meetingapp.cgi/Session/")
+)"""
+EXTRACT_LISTING_JS = "return {links: Array.from(document.links).map((a) => a.href)};"
+
+
+def extract_listing_html(html, url):
+    page = parse_html(html)
+    links = [
+        urljoin(url, a.attrs["href"]) for a in page.find_tag("a") if a.attrs.get("href")
+    ]
+    return {"links": links}
+
+
+def wait_for_listing(browser, url, has_abstract=True):
+    """
+    Load a program listing page in browser and wait for it to be ready. Returns its
+    state from wait_until_ready().
+    """
+    with span("browser.get", url=url):
+        browser.get(url)
+    with span("wait", url=url, kind="Listing"):
+        state = wait_until_ready(
+            browser, "Listing", LISTING_REQUIRED_JS, LISTING_SESSIONS_JS
+        )
+    if state is None:
+        print(f"    Loading took too much time (limit {delay} seconds). Url: {url}")
+    return state
+
+
+def extract_listing_selenium(browser):
+    return browser.execute_script(EXTRACT_LISTING_JS)
+
+
+PAGE_EXTRACTORS = {
+    "Paper": (
+        extract_presentation_html,
+        wait_for_presentation,
+        extract_presentation_selenium,
+    ),
+    "Session": (extract_session_html, wait_for_session, extract_session_selenium),
+    "Listing": (extract_listing_html, wait_for_listing, extract_listing_selenium),
+}
+
+
+class FetchPolicy:
+    """
+    How pages are fetched: at most requests_per_second from each site, retried with
+    jittered exponential backoff if they fail, and all paused for pause_seconds if at
+    least failure_rate of the last window fetches failed (a circuit breaker, so that a
+    struggling site isn't hammered)
+    """
+
+    def __init__(
+        self,
+        retries,
+        backoff_seconds,
+        requests_per_second,
+        failure_rate,
+        window,
+        pause_seconds,
+    ):
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.requests_per_second = requests_per_second
+        self.failure_rate = failure_rate
+        self.pause_seconds = pause_seconds
+        self.lock = Lock()
+        self.next_time = defaultdict(float)  # Site: earliest time of its next fetch
+        self.recent = deque(maxlen=window)  # Whether each recent fetch failed
+        self.paused_until = 0.0
+        self.n_retries = 0
+        self.n_failures = 0
+        self.n_pauses = 0
+        self.throttle_seconds = 0.0
+
+    def _wait_turn(self, url):
+        with self.lock:
+            now = time.monotonic()
+            start_time = max(now, self.paused_until)
+            if self.requests_per_second > 0:
+                site = urlsplit(url).netloc
+                start_time = max(start_time, self.next_time[site])
+                self.next_time[site] = start_time + 1 / self.requests_per_second
+            self.throttle_seconds += start_time - now
+        time.sleep(start_time - now)
+
+    def _record(self, failed):
+        with self.lock:
+            self.recent.append(failed)
+            self.n_failures += failed
+            full = len(self.recent) == self.recent.maxlen
+            if full and sum(self.recent) >= self.failure_rate * len(self.recent):
+                print(
+                    f"{sum(self.recent)} of the last {len(self.recent)} page loads"
+                    f" failed; pausing for {self.pause_seconds:.0f} s"
+                )
+                self.paused_until = time.monotonic() + self.pause_seconds
+                self.recent.clear()
+                self.n_pauses += 1
+
+    def fetch(self, url, attempt):
+        """
+        Fetch url with attempt(), which returns (result, whether it worked), retrying
+        if it didn't work or raised an exception. Returns the last result, or raises
+        the last exception.
+        """
+        for n in range(self.retries + 1):
+            self._wait_turn(url)
+            error = None
+            try:
+                result, worked = attempt()
+            except Exception as e:
+                if not retryable(e):
+                    raise
+                error = e
+                worked = False
+            self._record(not worked)
+            if worked:
+                return result
+            if n < self.retries:
+                wait = self.backoff_seconds * 2**n * random.uniform(0.5, 1.5)
+                print(f"{INDENT}Retrying in {wait:.1f} s: {url}")
+                with self.lock:
+                    self.n_retries += 1
+                time.sleep(wait)
+        if error:
+            raise error
+        return result
+
+    def summary(self):
+        return (
+            f"Fetching: {self.n_retries} retry(ies), {self.n_failures} failed"
+            f" fetch(es), paused {self.n_pauses} time(s) for too many failures,"
+            f" {self.throttle_seconds:.1f} s waiting to fetch"
+        )
+
+
+def retryable(e):
+    """
+    Whether fetching a page again might work after the given exception: not for
+    HTTP errors that mean the page isn't there (e.g., 404)
+    """
+    code = getattr(e, "code", None)
+    return not (isinstance(code, int) and 400 <= code < 500 and code not in [408, 429])
+
+
+def get_fetch_policy():
+    """
+    Get the FetchPolicy for this run, making it if needed
+    """
+    global fetch_policy
+    if fetch_policy is None:
+        fetch_policy = FetchPolicy(
+            retries,
+            retry_backoff_seconds,
+            max_requests_per_second,
+            breaker_failure_rate,
+            breaker_window,
+            breaker_pause_seconds,
+        )
+    return fetch_policy
+
+
+# Reading a page is split into fetching it (downloading its HTML, or loading it in a
+# browser and waiting until it's ready) and extracting its record.
+
+
+def fetch_page(url, tz, kind, browser=None, has_abstract=True, use_http=None):
+    """
+    Fetch a Paper or Session page. With backend = http, this tries to download it
+    without a browser first. Otherwise it's loaded in browser, or in one borrowed from
+    the BrowserManager (returned to it by extract_page()).
+    """
+    if use_http is None:
+        use_http = backend == "http"
+    page = {
+        "url": url,
+        "kind": kind,
+        "html": None,
+        "browser": None,
+        "borrowed": False,
+        "partial": False,
+    }
+    policy = get_fetch_policy()
+    if use_http:
+        try:
+            with span("http_get", url=url):
+                page["html"] = policy.fetch(url, lambda: (http_get(url), True))
+            return page
+        except Exception as e:
+            print(f"{INDENT}Couldn't download page ({e}); using browser")
+    if not browser:
+        browser = get_browser_manager(tz).acquire()
+        page["borrowed"] = True
+    page["browser"] = browser
+    try:
+        wait_selenium = PAGE_EXTRACTORS[kind][1]
+        manager = get_browser_manager(tz) if page["borrowed"] else None
+
+        def attempt():
+            if manager:
+                manager.count_page(browser)
+            # Retry pages that didn't load, not ones that only partly did (e.g., a
+            # presentation without an abstract)
+            state = wait_selenium(browser, url, has_abstract)
+            return state, state is not None
+
+        state = policy.fetch(url, attempt)
+        # Presentation and listing pages that never loaded are still read to see
+        # what's there, but a session page isn't
+        page["ready"] = state is not None or kind != "Session"
+        # ...and what's read from a page that wasn't fully ready isn't kept
+        page["partial"] = state != "ready"
+    except:
+        release_page(page, tz)
+        raise
+    return page
+
+
+def release_page(page, tz):
+    if page["borrowed"]:
+        get_browser_manager(tz).release(page["browser"])
+        page["borrowed"] = False
+
+
+class NeedsBrowser(Exception):
+    """
+    A page was downloaded but can't be read without a browser
+    """
+
+
+def extract_page(page, tz):
+    """
+    Get the record for a page from fetch_page(), or None if it never finished loading.
+    If it was downloaded but can't be read, raises NeedsBrowser, for the caller to
+    fetch it again in a browser (fetch_page() with use_http=False). That's left to the
+    caller so that a page being extracted never waits for a browser, which could be
+    held by a page waiting to be extracted.
+    """
+    extract_html, _, extract_selenium = PAGE_EXTRACTORS[page["kind"]]
+    if page["html"] is not None:
+        try:
+            with span("extract", url=page["url"], kind=page["kind"], via="html"):
+                return extract_html(page["html"], page["url"])
+        except Exception as e:
+            raise NeedsBrowser(f"Couldn't read page without browser ({e})") from e
+    try:
+        if not page["ready"]:
+            return None
+        with span("extract", url=page["url"], kind=page["kind"], via="browser"):
+            return extract_selenium(page["browser"])
+    finally:
+        release_page(page, tz)
+
+
+def load_page(url, tz, kind, browser=None, has_abstract=True):
+    """
+    Fetch a Paper or Session page and get its record, using the cache if enabled
+    """
+    record = lookup_record(url)
+    if record is not None:
+        return record
+    page = fetch_page(url, tz, kind, browser, has_abstract=has_abstract)
+    try:
+        record = extract_page(page, tz)
+    except NeedsBrowser as e:
+        print(f"{INDENT}{e}; using browser")
+        page = fetch_page(url, tz, kind, has_abstract=has_abstract, use_http=False)
+        record = extract_page(page, tz)
+    remember_record(url, kind, record, page["partial"])
+    return record
+
+
+def lookup_record(url):
+    """
+    Get a page's record without fetching it, if the incremental state store has a
+    fresh one or the page cache has one. Otherwise None.
+    """
+    state = get_state_store()
+    if state:
+        record = state.fresh_record(url)
+        if record is not None:
+            return record
+    cache = get_page_cache()
+    if cache:
+        return cache.get(url)
+    return None
+
+
+def remember_record(url, kind, record, partial=False):
+    """
+    Save a page's record after fetching it, unless it's from a page that wasn't fully
+    ready (partial), which is fetched again next time instead
+    """
+    if record is None or partial:
+        return
+    cache = get_page_cache()
+    if cache:
+        cache.put(url, record)
+    state = get_state_store()
+    if state:
+        state.record_fetched(url, kind, record)
+
+
+class PageCache:
+    """
+    Records of pages already read, saved on disk as one JSON file per URL. Entries
+    older than ttl_seconds are ignored (unless offline); beyond max_bytes, the least
+    recently used are deleted.
+    """
+
+    def __init__(self, directory, ttl_seconds, max_bytes, offline=False):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(e.stat().st_size for e in self._entries())
+
+    def _entries(self):
+        return [e for e in scandir(self.directory) if e.name.endswith(".json")]
+
+    def _path(self, url):
+        key = hashlib.sha256(normalize_url(url).encode()).hexdigest()
+        return path.join(self.directory, key + ".json")
+
+    def get(self, url):
+        cache_file = self._path(url)
+        try:
+            with open(cache_file) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        if entry is not None:
+            age = time.time() - entry["saved"]
+            if self.offline or age < self.ttl_seconds:
+                try:
+                    utime(cache_file)  # Mark as recently used
+                except FileNotFoundError:
+                    pass  # Evicted by another process since being read
+                with self.lock:
+                    self.hits += 1
+                return entry["record"]
+        if self.offline:
+            raise RuntimeError(f"Page not in cache (running with --offline): {url}")
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, url, record):
+        cache_file = self._path(url)
+        entry = {"url": normalize_url(url), "saved": time.time(), "record": record}
+        tmp_file = f"{cache_file}.{getpid()}-{get_ident()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(entry, f)
+        with self.lock:
+            if path.exists(cache_file):
+                self.total_bytes -= path.getsize(cache_file)
+            replace(tmp_file, cache_file)
+            self.total_bytes += path.getsize(cache_file)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Down to 90% of the limit, so we don't have to do this after every put()
+        entries = sorted(self._entries(), key=lambda e: e.stat().st_mtime)
+        for entry in entries:
+            if self.total_bytes <= 0.9 * self.max_bytes:
+                break
+            size = entry.stat().st_size
+            try:
+                remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self.total_bytes -= size
+
+    def summary(self):
+        return f"Page cache: {self.hits} hit(s), {self.misses} miss(es)"
+
+
+def get_page_cache():
+    """
+    Get the PageCache for this run, making it if needed. None if caching is off.
+    """
+    global page_cache
+    if page_cache is None and (use_cache or offline):
+        page_cache = PageCache(
+            cache_dir, cache_ttl_hours * 3600, cache_max_mb * 1024**2, offline
+        )
+    return page_cache
+
+
+def record_hash(record):
+    return hashlib.sha256(json.dumps(record, sort_keys=True).encode()).hexdigest()
+
+
+class StateStore:
+    """
+    SQLite database of every page read in incremental mode: when it was last fetched,
+    its record, and the note last written from it (with a hash of the record it was
+    written from).
+    """
+
+    def __init__(self, db_file, stale_seconds):
+        self.stale_seconds = stale_seconds
+        self.lock = Lock()
+        self.db = sqlite3.connect(db_file, check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                kind TEXT,
+                fetched REAL,
+                record TEXT,
+                output_file TEXT,
+                written_hash TEXT
+            )
+            """)
+        self.db.commit()
+        self.n_fresh = 0
+        self.n_unchanged = 0
+        self.n_written = 0
+
+    def _get(self, url, columns):
+        with self.lock:
+            return self.db.execute(
+                f"SELECT {columns} FROM pages WHERE url = ?", (normalize_url(url),)
+            ).fetchone()
+
+    def fresh_record(self, url):
+        """
+        The page's record if it was fetched less than stale_seconds ago, otherwise None
+        """
+        row = self._get(url, "fetched, record")
+        if row is None or time.time() - row[0] > self.stale_seconds:
+            return None
+        with self.lock:
+            self.n_fresh += 1
+        return json.loads(row[1])
+
+    def record_fetched(self, url, kind, record):
+        with self.lock, self.db:
+            self.db.execute(
+                """
+                INSERT INTO pages (url, kind, fetched, record) VALUES (?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    kind = excluded.kind,
+                    fetched = excluded.fetched,
+                    record = excluded.record
+                """,
+                (normalize_url(url), kind, time.time(), json.dumps(record)),
+            )
+
+    def is_current(self, url, output_file, record):
+        """
+        Whether output_file exists and was written from an identical record. If the
+        page's note was last written somewhere else, that old note is archived.
+        """
+        row = self._get(url, "output_file, written_hash")
+        if row is None or row[0] is None:
+            return False
+        previous_file, written_hash = row
+        if previous_file != output_file:
+            if path.isfile(previous_file):
+                print(f"Archiving note for {url} that has moved: '{previous_file}'")
+                do_replace(previous_file)
+            return False
+        current = path.isfile(output_file) and written_hash == record_hash(record)
+        if current:
+            with self.lock:
+                self.n_unchanged += 1
+        return current
+
+    def record_written(self, url, output_file, record):
+        with self.lock, self.db:
+            self.n_written += 1
+            self.db.execute(
+                "UPDATE pages SET output_file = ?, written_hash = ? WHERE url = ?",
+                (output_file, record_hash(record), normalize_url(url)),
+            )
+
+    def summary(self):
+        return (
+            f"Incremental: {self.n_fresh} page(s) fresh enough not to re-read,"
+            f" {self.n_unchanged} note(s) unchanged, {self.n_written} note(s) written"
+        )
+
+
+def get_state_store():
+    """
+    Get the StateStore for this run, making it if needed. None unless incremental.
+    """
+    global state_store
+    if state_store is None and incremental:
+        state_store = StateStore(state_db, incremental_stale_hours * 3600)
+    return state_store
+
+
+class CrawlCheckpoint:
+    """
+    SQLite database of a crawl's progress: the listing pages to read (and whether
+    they have been), the sessions found on them, and which sessions are done. Several
+    crawl processes (e.g., one per --shard) can share one.
+    """
+
+    def __init__(self, db_file):
+        self.lock = Lock()
+        self.db = sqlite3.connect(db_file, check_same_thread=False, timeout=60)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS listings (
+                url TEXT PRIMARY KEY,
+                read INTEGER DEFAULT 0  -- 1 once read, -1 if it failed
+            );
+            CREATE TABLE IF NOT EXISTS sessions (
+                url TEXT PRIMARY KEY,
+                done INTEGER DEFAULT 0,
+                finished REAL
+            );
+            """)
+        self.db.commit()
+
+    def add_listings(self, urls):
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO listings (url) VALUES (?)", [(u,) for u in urls]
+            )
+
+    def retry_failed_listings(self):
+        with self.lock, self.db:
+            self.db.execute("UPDATE listings SET read = 0 WHERE read = -1")
+
+    def unread_listings(self):
+        with self.lock:
+            rows = self.db.execute("SELECT url FROM listings WHERE read = 0")
+            return [row[0] for row in rows]
+
+    def n_listings(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
 
-browser = None
-INDENT = 4 * " "
+    def listing_read(self, url, session_urls, listing_urls):
+        """
+        Record what was found on a listing page, all at once so that an interrupted
+        crawl reads the page again
+        """
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO sessions (url) VALUES (?)",
+                [(u,) for u in session_urls],
+            )
+            self.db.executemany(
+                "INSERT OR IGNORE INTO listings (url) VALUES (?)",
+                [(u,) for u in listing_urls],
+            )
+            self.db.execute("UPDATE listings SET read = 1 WHERE url = ?", (url,))
 
+    def listing_failed(self, url):
+        """
+        Record that a listing page couldn't be read, so it isn't tried again until the
+        next crawl
+        """
+        with self.lock, self.db:
+            self.db.execute("UPDATE listings SET read = -1 WHERE url = ?", (url,))
 
-def truncate_filename(filename):
-    filepath = path.split(filename)
-    pardir = path.join(*filepath[:-1])
-    orig_basename = path.basename(filename)
-    basename = orig_basename
-    max_basename_length = 255
-    Ndrop = 0
-    while len(basename) > max_basename_length:
-        # Remove the last word of the filename (replace with ellipsis) and try again
-        Ndrop += 1
-        prev_basename = basename
-        name, ext = path.splitext(orig_basename)
-        name_list = name.split(" ")
-        basename = " ".join(name_list[:-Ndrop]) + " …" + ext
-        if basename == prev_basename:
-            raise RuntimeError("Infinite loop in truncate_filename()")
-    return path.join(pardir, basename)
+    def n_failed_listings(self):
+        with self.lock:
+            rows = self.db.execute("SELECT COUNT(*) FROM listings WHERE read = -1")
+            return rows.fetchone()[0]
 
+    def sessions(self):
+        """
+        Every session found so far, as {URL: whether it's done}
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT url, done FROM sessions ORDER BY url")
+            return {url: bool(done) for url, done in rows}
 
-def resource_path(relative_path: str) -> str:
-    try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = path.dirname(__file__)
-    return path.join(base_path, relative_path)
+    def session_done(self, url):
+        with self.lock, self.db:
+            self.db.execute(
+                "UPDATE sessions SET done = 1, finished = ? WHERE url = ?",
+                (time.time(), url),
+            )
 
 
-# Set defaults
-thisYear = datetime.now().year
-debug = False
-overwrite = False
-filter_date = None  # Optional date to filter events
+# Links from program listings to these kinds of page aren't followed by --crawl (links
+# to other pages of the meeting app are, as possible listings of more sessions)
+CRAWL_SKIP_KINDS = {"Session", "Paper", "Person", "Attendee", "Exhibitor"}
+CRAWL_MAX_LISTINGS = 2000  # Stop following links from listings after this many
 
-# Read settings file
-settings_file = "settings.ini"
-if path.exists(settings_file):
-    config = ConfigParser()
-    config.read(settings_file)
-    if config.has_option("optional", "year"):
-        thisYear = config.get("optional", "year")
-        thisYear = int(thisYear)
-    if config.has_option("optional", "output_location"):
-        outDir = config.get("optional", "output_location")
-        if not path.exists(outDir):
-            makedirs(outDir)
-        chdir(outDir)
-    if config.has_option("optional", "debug"):
-        debug = config.get("optional", "debug").lower() == "true"
-    if config.has_option("optional", "overwrite"):
-        overwrite = config.get("optional", "overwrite").lower() == "true"
-    if config.has_option("optional", "date"):
-        date_str = config.get("optional", "date")
-        try:
-            filter_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        except ValueError as e:
-            raise ValueError(
-                f"Invalid date (expected format YYYY-MM-DD): {date_str}"
-            ) from e
-        except Exception as e:
-            raise RuntimeError("Error parsing date from settings") from e
 
+def crawl_checkpoint_file(meeting):
+    """
+    Where --crawl keeps track of its progress for a meeting (given as for
+    crawl_start_urls()), in the output directory
+    """
+    url = crawl_start_urls(meeting)[0]
+    name = url.split("/meetingapp.cgi/")[0].rstrip("/").split("/")[-1]
+    return f".agu-notes-crawl-{name}.sqlite"
 
-def get_tz(this_year):
-    if this_year in [2022]:
-        tz = "America/Chicago"
-    elif this_year in [2023]:
-        tz = "US/Pacific"
-    elif this_year in [2024]:
-        tz = "US/Eastern"
-    elif this_year in [2025]:
-        tz = "US/Central"
-    else:
-        raise KeyError(f"What time zone for AGU {this_year}?")
-    return tz
 
+def crawl_start_urls(meeting):
+    """
+    Where to start crawling a meeting: given as a meeting code (e.g., agu25), its home
+    page; given as a URL, that page
+    """
+    if "://" in meeting:
+        return [normalize_url(meeting)]
+    return [f"https://agu.confex.com/agu/{meeting}/meetingapp.cgi/Home/0"]
 
-def start_browser(tz):
-    # Selenium will download the necessary version of Chrome For Testing
-    service = Service()
-    options = webdriver.ChromeOptions()
-    if not debug:
-        options.add_argument("--headless")  # Invisible window
-    browser = webdriver.Chrome(service=service, options=options)
 
-    tz_params = {"timezoneId": tz}
-    browser.execute_cdp_cmd("Emulation.setTimezoneOverride", tz_params)
-    return browser
+def in_shard(url, shard):
+    """
+    Whether a session belongs to shard (i, n), i.e. the ith of n; every session is in
+    exactly one shard, whichever process or machine is asking
+    """
+    i, n = shard
+    return int(hashlib.sha256(url.encode()).hexdigest(), 16) % n == i - 1
 
 
-# Parse "summary" into event title and code (if any)
-def summary_to_codetitle(summary, parent_code=None):
-    # Remove extraneous information
-    summary = summary.replace("NCA5 Author\n", "")
-    if parent_code:
-        code = re.findall(parent_code + r"\-\d+ ", summary)
-    else:
-        code = re.findall(r"[\d\-A-Z]+ - ", summary)
-    if not code:
-        code = re.findall(r"^[\d\-A-Z]+ ", summary)
-    if code:
-        title = summary.replace(code[0], "")
-        code = code[0].replace(" - ", "").replace(" ", "")
-    else:
-        title = summary
-    return code, title
+def error_text(e):
+    """
+    Describe an exception and everything that caused it, on one line
+    """
+    parts = []
+    while e is not None:
+        parts.append(" ".join(str(e).split()) or type(e).__name__)
+        e = e.__cause__
+    return ": ".join(parts)
 
 
-# Replace illegal characters for Obsidian filenames
-def codetitle_to_filename(code, title):
-    if code:
-        filename = f"{code} {title}"
-    else:
-        filename = title
-    if ":" in filename:
-        filename = filename.replace(": ", "—")
-        filename = filename.replace(":", "—")
-    if "?" in filename:
-        filename = filename.replace("?", "")
-    if "/" in filename:
-        filename = filename.replace("/", "-")
-    for c in ["*", '"', "\\", "/", "<", ">", ":", "|", "?"]:
-        if c in filename:
-            raise RuntimeError(f"Illegal character {c} in filename: '{filename}'")
-    return filename
+class Journal:
+    """
+    Record of each URL's progress in a run: pending, done or failed (with the error),
+    so that --resume can carry on where a run stopped. It's a file of JSON lines,
+    added to (and flushed to disk) as each URL's state changes; the last line for a
+    URL is its state.
+    """
 
+    def __init__(self, journal_file, resume=False):
+        self.lock = Lock()
+        self.states = {}  # Normalized URL: (state, error)
+        if resume and path.exists(journal_file):
+            with open(journal_file) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # E.g., the last line, if the run was killed while writing it
+                        continue
+                    self.states[entry["url"]] = (entry["state"], entry.get("error"))
+        self.file = open(journal_file, "a" if resume else "w")
+        self.n_skipped = 0
+        self.failures = {}  # Normalized URL: error, for URLs that failed this run
 
-def do_replace(output_file):
-    old_file = output_file.replace(
-        ".md", " " + datetime.now().strftime("%Y%m%d%H%M%S") + ".md"
-    )
-    file_archive = output_file.replace(".md", " ARCHIVE.zip")
-    rename(output_file, old_file)
-    with ZipFile(file_archive, "a") as zipObj:
-        zipObj.write(old_file)
-    remove(old_file)
+    def _write(self, url, state, error=None):
+        entry = {
+            "url": url,
+            "state": state,
+            "time": datetime.now().isoformat(timespec="seconds"),
+        }
+        if error:
+            entry["error"] = error
+        with self.lock:
+            self.states[url] = (state, error)
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+            fsync(self.file.fileno())
 
+    def pending(self, url):
+        self._write(normalize_url(url), "pending")
 
-def find_or_none(driver, classname):
-    x = driver.find_elements(By.CLASS_NAME, classname)
-    if len(x) > 0:
-        x = x[0].text
-    else:
-        x = None
-    return x
+    def done(self, url):
+        url = normalize_url(url)
+        with self.lock:
+            self.failures.pop(url, None)
+        self._write(url, "done")
+
+    def failed(self, url, e):
+        url = normalize_url(url)
+        with self.lock:
+            self.failures[url] = error_text(e)
+        self._write(url, "failed", error_text(e))
+
+    def is_done(self, url):
+        with self.lock:
+            return self.states.get(normalize_url(url), ("pending",))[0] == "done"
+
+    def skip(self):
+        with self.lock:
+            self.n_skipped += 1
+
+    def unfinished(self):
+        """
+        URLs that were pending or failed when the journal was last written
+        """
+        with self.lock:
+            return [url for url, (state, _) in self.states.items() if state != "done"]
+
+    def summary(self):
+        lines = []
+        if self.n_skipped:
+            lines.append(f"Skipped {self.n_skipped} URL(s) already done")
+        with self.lock:
+            failures = dict(self.failures)
+        if failures:
+            lines.append(f"{len(failures)} URL(s) failed (retry with --resume):")
+            for url, error in failures.items():
+                lines.append(f"{INDENT}{url}: {error}")
+        return "\n".join(lines)
 
 
 def get_presentation(
@@ -176,113 +2477,53 @@ def get_presentation(
     author_list2=None,
     dirname=None,
 ):
-    if not browser:
-        browser = start_browser(tz)
-
-    printed_title = False
     if title:
         print(f"Importing presentation: {title}")
-        printed_title = True
-
     if debug:
         print("URL: " + url)
-    browser.get(url)
-    start_time = datetime.now()
-    abstract_failed = False
-    try:
-        WebDriverWait(browser, delay).until(
-            EC.presence_of_element_located(
-                (By.CLASS_NAME, "field_ParentList_ParentEntries")
-            )
-        )
-        remaining_time = max(1, delay - (datetime.now() - start_time).total_seconds())
-        if has_abstract:
-            try:
-                WebDriverWait(browser, remaining_time).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, "field_Abstract"))
-                )
-            except TimeoutException:
-                has_abstract = False
-                abstract_failed = True
-            remaining_time = max(
-                1, delay - (datetime.now() - start_time).total_seconds()
-            )
-        if not author_list2:
-            try:
-                WebDriverWait(browser, remaining_time).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, "RoleListItem"))
-                )
-            except TimeoutException:
-                pass
-    except TimeoutException:
-        print(f"    Loading took too much time (limit {delay} seconds). Url: {url}")
+    record = load_page(url, tz, "Paper", browser, has_abstract=has_abstract)
+    return write_presentation(
+        url,
+        session_urls,
+        record,
+        title=title,
+        has_abstract=has_abstract,
+        author_list2=author_list2,
+        dirname=dirname,
+    )
+
+
+def presentation_fields(url, record, title=None, has_abstract=True, author_list2=None):
+    """
+    Work out everything that goes in a presentation's note from its record
+    """
+    abstract_failed = has_abstract and record["abstract"] is None
+    if abstract_failed:
         has_abstract = False
 
     # Parent session
-    parent = browser.find_element(By.CLASS_NAME, "field_ParentList_ParentEntries")
-    tries = 0
-    parent2 = None
-    while not parent2 and tries < 15:
-        tries = tries + 1
-        try:
-            parent2 = parent.find_element(By.TAG_NAME, "a")
-        except:
-            time.sleep(1)
-    if not parent2:
-        raise RuntimeError("Parent session info not found!")
-    parent_session_code, parent_session_title = summary_to_codetitle(parent2.text)
-    parent_session_filename = "_" + codetitle_to_filename(
-        parent_session_code, parent_session_title
+    parent_session_code, parent_session_title = summary_to_codetitle(
+        record["parent_text"]
+    )
+    parent_session_url = record["parent_url"]
+    parent_session_filename = "_" + session_filename(
+        parent_session_url, parent_session_code, parent_session_title
     )
-    if dirname is None:
-        dirname = parent_session_filename[1:]
-        makedirs(dirname, exist_ok=True)
-    parent_session_url = parent2.get_property("href")
-    if parent_session_url not in session_urls:
-        session_urls = session_urls + [parent_session_url]
     if debug:
         print(f"Parent session: {parent_session_title} ({parent_session_url})")
         print(f"Parent session filename: {parent_session_filename}")
 
     # Parse "summary" into event title and code (if any)
-    code, title = summary_to_codetitle(
-        browser.find_element(By.CLASS_NAME, "titleContent").text,
-        parent_session_code,
-    )
+    code, title = summary_to_codetitle(record["title_text"], parent_session_code)
     if not code:
         code = f"{parent_session_code}-XX"
-    if not printed_title:
-        print(f"Importing presentation: {title}")
-    if abstract_failed:
-        print("    (No abstract found)")
     if debug:
         print(f"Code: {code}")
         print(f"Title: {title}")
 
-    # Replace illegal characters for Obsidian filenames
-    filename = codetitle_to_filename(code, title)
-    filename_md = filename + ".md"
-    filename_md = truncate_filename(filename_md)
-    output_file = path.join(dirname, filename_md)
-    if debug:
-        print(f"Output file: '{output_file}'")
-
-    if path.isfile(output_file):
-        if not overwrite:
-            print(f"Won't overwrite existing paper file: '{output_file}'")
-            return session_urls
-        do_replace(output_file)
-    if debug:
-        print(f"Filename: '{filename}'")
-        print(f"Filename (md): '{filename_md}'")
-
     # Abstract
     if has_abstract:
-        if debug:
-            print("Getting abstract")
-        abstract = browser.find_element(By.CLASS_NAME, "field_Abstract").text.replace(
-            "Abstract\n", ""
-        )
+        abstract = record["abstract"].replace("Abstract\n", "")
         abstract = abstract.replace("\n", "\n\n")
         abstract = abstract.replace("\n\n\n", "\n\n")
         if debug:
@@ -291,14 +2532,9 @@ def get_presentation(
         abstract = ""
 
     # P-L Summary
-    pl_summary = None
-    field_ExtendedAbstract = browser.find_elements(
-        By.CLASS_NAME, "field_ExtendedAbstract"
-    )
-    if len(field_ExtendedAbstract) > 0:
-        pl_summary = field_ExtendedAbstract[0].text.replace(
-            "Plain-language Summary\n", ""
-        )
+    pl_summary = record["pl_summary"]
+    if pl_summary is not None:
+        pl_summary = pl_summary.replace("Plain-language Summary\n", "")
         pl_summary = pl_summary.replace("\n", "\n\n")
         pl_summary = pl_summary.replace("\n\n\n", "\n\n")
     if debug:
@@ -306,139 +2542,265 @@ def get_presentation(
 
     # Authors
     if not author_list2:
-        authors = browser.find_elements(By.CLASS_NAME, "RoleListItem")
-        author_list = ""
-        author_names = []
-        author_insts = []
-        author_insts_all = []
-        for a, author in enumerate(authors):
-            name = None
-            tries = 0
-            while not name and tries < 15:
-                tries = tries + 1
-                try:
-                    author_split = author.text.split("\n")
-                    name = author_split[1]
-                    if len(author_split) > 2:
-                        institution = author_split[2]
-                    else:
-                        institution = None
-                except:
-                    time.sleep(1)
-            if not name:
-                raise RuntimeError("Author info not found!")
-            author_list = author_list + f"{name} ({institution})"
-            if a < len(authors) - 1:
-                author_list = author_list + ", "
-            author_names = author_names + [name]
-            author_insts_all = author_insts_all + [institution]
-            if institution:
-                if institution not in author_insts:
-                    author_insts = author_insts + [institution]
-        ## print(author_list)
-        author_list2 = ""
-        for a, author in enumerate(author_names):
-            inst = author_insts_all[a]
-            if inst:
-                inst_num = author_insts.index(inst) + 1
-                author_list2 = author_list2 + f"{author} ({inst_num})"
-            else:
-                author_list2 = author_list2 + f"{author}"
-            if a < len(authors) - 1:
-                author_list2 = author_list2 + ", "
+        author_list2, inst_list = number_people(record["authors"])
         if debug:
             print(author_list2)
-        inst_list = ""
-        for i, inst in enumerate(author_insts):
-            inst_list = inst_list + f"({i+1}) {inst}"
-            if i < len(author_insts) - 1:
-                inst_list = inst_list + ", "
-        if debug:
             print(inst_list)
     else:
         inst_list = ""
 
     # Parse other information
-    event_daydate = browser.find_element(By.CLASS_NAME, "SlotDate").text
+    event_daydate = record["slot_date"]
     event_day = re.findall("^[A-Za-z]+", event_daydate)[0]
     event_date = event_daydate.replace(f"{event_day}, ", "")
-    event_time = browser.find_element(By.CLASS_NAME, "SlotTime").text.replace(
-        " - ", "-"
-    )
-    location = browser.find_element(By.CLASS_NAME, "propertyInfo").text
+    event_time = record["slot_time"].replace(" - ", "-")
+    location = record["location"]
     while location[0] == " ":
         location = location[1:]
     if debug:
         print(f"{event_date} ({event_day}) at {event_time} in {location}")
 
-    with open(output_file, "w") as outFile:
-        outFile.write(f"#seminar #AGU{thisYear} #AGU\n")
-        outFile.write(
-            f"Parent session: [[{parent_session_filename}|{parent_session_title}]]\n\n"
-        )
-        outFile.write(f"# [{title}]({url})\n")
-        if author_list2:
-            outFile.write(f"{author_list2}\n")
-        else:
-            print("    (No author list found)")
-        outFile.write(f"{inst_list}\n\n")
-        outFile.write(f"{event_time} {event_day} {event_date}\n")
-        outFile.write(f"{location}\n\n")
-        if has_abstract or pl_summary:
-            outFile.write("## Description\n")
-            if has_abstract:
-                outFile.write("### Abstract\n")
-                outFile.write(f"{abstract}\n\n")
-            if pl_summary:
-                outFile.write("### Plain-language summary\n")
-                outFile.write(f"{pl_summary}\n")
-        outFile.write("\n")
-        outFile.write("## Notes\n")
-        outFile.write("- \n\n\n")
-
-    return session_urls
+    return {
+        "url": url,
+        "code": code,
+        "title": title,
+        "parent_session_code": parent_session_code,
+        "parent_session_title": parent_session_title,
+        "parent_session_filename": parent_session_filename,
+        "parent_session_url": parent_session_url,
+        "abstract_failed": abstract_failed,
+        "has_abstract": has_abstract,
+        "abstract": abstract,
+        "pl_summary": pl_summary,
+        "author_list2": author_list2,
+        "inst_list": inst_list,
+        "event_time": event_time,
+        "event_day": event_day,
+        "event_date": event_date,
+        "location": location,
+    }
 
 
-def get_session(url, tz, browser=None, has_abstract=True):
+def render_presentation(fields):
+    """
+    Get the Markdown for a presentation's note from presentation_fields()
+    """
+    parent_link = (
+        f"[[{fields['parent_session_filename']}|{fields['parent_session_title']}]]"
+    )
+    lines = [
+        f"#seminar #AGU{thisYear} #AGU\n",
+        f"Parent session: {parent_link}\n\n",
+        f"# [{fields['title']}]({fields['url']})\n",
+    ]
+    if fields["author_list2"]:
+        lines.append(f"{fields['author_list2']}\n")
+    lines.append(f"{fields['inst_list']}\n\n")
+    lines.append(
+        f"{fields['event_time']} {fields['event_day']} {fields['event_date']}\n"
+    )
+    lines.append(f"{fields['location']}\n\n")
+    if fields["has_abstract"] or fields["pl_summary"]:
+        lines.append("## Description\n")
+        if fields["has_abstract"]:
+            lines.append("### Abstract\n")
+            lines.append(f"{fields['abstract']}\n\n")
+        if fields["pl_summary"]:
+            lines.append("### Plain-language summary\n")
+            lines.append(f"{fields['pl_summary']}\n")
+    lines.append("\n")
+    lines.append("## Notes\n")
+    lines.append("- \n\n\n")
+    return "".join(lines)
 
-    if not browser:
-        browser = start_browser(tz)
 
-    if debug:
-        print("URL: " + url)
-    browser.get(url)
+def write_note(output_file, text):
+    """
+    Write a note in one go: to a temporary file next to it, then renamed into place so
+    that the note is never seen half-written
+    """
+    # Hidden, so Obsidian ignores it; unique to this thread
+    tmp_file = path.join(path.dirname(output_file), f".{getpid()}-{get_ident()}.tmp")
     try:
-        # WebDriverWait(browser, delay).until(EC.presence_of_element_located((By.CLASS_NAME, "finalNumber")))
-        WebDriverWait(browser, delay).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "favoriteItem"))
-        )
-        WebDriverWait(browser, delay).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "field_ParentList_SlotData"))
-        )
-        WebDriverWait(browser, delay).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "SlotDate"))
+        with span("write_note", file=output_file):
+            with open(tmp_file, "w") as outFile:
+                outFile.write(text)
+            replace(tmp_file, output_file)
+    except:
+        if path.exists(tmp_file):
+            remove(tmp_file)
+        raise
+
+
+# Where the user's own notes start in a note; everything from here on is ignored when
+# checking whether a note has changed
+USER_NOTES_RE = re.compile(r"^#+ (?:Session |Panel )?[Nn]otes$", re.MULTILINE)
+
+note_counts = Counter()  # "written", "unchanged", "archived"
+note_counts_lock = Lock()
+
+
+def count_note(what):
+    with note_counts_lock:
+        note_counts[what] += 1
+
+
+def without_user_notes(text):
+    match = USER_NOTES_RE.search(text)
+    if match:
+        text = text[: match.start()]
+    return text.rstrip()
+
+
+def with_user_notes(text, existing):
+    """
+    A new version of a note, with its notes section (from the heading on) replaced by
+    the existing version's, so that what the user wrote there is kept
+    """
+    match = USER_NOTES_RE.search(text)
+    existing_match = USER_NOTES_RE.search(existing)
+    if not (match and existing_match):
+        return text
+    return text[: match.start()] + existing[existing_match.start() :]
+
+
+notes_lock_held = local()
+
+
+@contextmanager
+def notes_lock():
+    """
+    With processes > 1, make other processes wait to write notes until this is done,
+    so that two processes never replace the same note at once
+    """
+    if processes == 1 or fcntl is None or getattr(notes_lock_held, "depth", 0):
+        # Already held by this thread (e.g. replace_note filling an archive batch)
+        yield
+        return
+    with open(".agu-notes-write.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        notes_lock_held.depth = 1
+        try:
+            yield
+        finally:
+            notes_lock_held.depth = 0
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def replace_note(output_file, text):
+    """
+    Write a note, archiving any old version first, unless the old version is the same
+    apart from the user's notes; then it's left alone. Returns whether it was written.
+    """
+    with notes_lock():
+        return _replace_note(output_file, text)
+
+
+def _replace_note(output_file, text):
+    if path.isfile(output_file):
+        with open(output_file) as f:
+            existing = f.read()
+        if without_user_notes(existing) == without_user_notes(text):
+            count_note("unchanged")
+            if debug:
+                print(f"Unchanged: '{output_file}'")
+            return False
+        text = with_user_notes(text, existing)
+        do_replace(output_file)
+    write_note(output_file, text)
+    count_note("written")
+    return True
+
+
+def note_summary():
+    with note_counts_lock:
+        return (
+            f"Notes: {note_counts['written']} written,"
+            f" {note_counts['unchanged']} unchanged,"
+            f" {note_counts['archived']} archived"
         )
-        WebDriverWait(browser, delay).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "field_GoodType"))
+
+
+def write_presentation(
+    url,
+    session_urls,
+    record,
+    title=None,
+    has_abstract=True,
+    author_list2=None,
+    dirname=None,
+):
+    """
+    Write the note for a presentation given its record. Returns session_urls plus its
+    parent session's URL.
+    """
+    printed_title = bool(title)
+    fields = presentation_fields(
+        url, record, title=title, has_abstract=has_abstract, author_list2=author_list2
+    )
+    if dirname is None:
+        dirname = fields["parent_session_filename"][1:]
+        makedirs(dirname, exist_ok=True)
+    parent_session_url = fields["parent_session_url"]
+    if parent_session_url not in session_urls:
+        session_urls = session_urls + [parent_session_url]
+
+    if not printed_title:
+        print(f"Importing presentation: {fields['title']}")
+    if fields["abstract_failed"]:
+        print("    (No abstract found)")
+
+    # Replace illegal characters for Obsidian filenames
+    with span("filename", url=url, session=fields["parent_session_code"]):
+        filename = get_filename_allocator().allocate(
+            dirname, fields["code"], fields["title"], normalize_url(url)
         )
+        filename_md = filename + ".md"
+        output_file = path.join(dirname, filename_md)
+    if debug:
+        print(f"Output file: '{output_file}'")
+    if people_notes:
+        get_people_index().add_note(filename, record["authors"])
 
-    except TimeoutException:
-        print(f"Loading took too much time (limit {delay} seconds!")
+    state = get_state_store()
+    if state and state.is_current(url, output_file, record):
         if debug:
-            for class_name in [
-                "favoriteItem",
-                "field_ParentList_SlotData",
-                "SlotDate",
-                "field_GoodType",
-            ]:
-                found = len(browser.find_elements(By.CLASS_NAME, class_name)) > 0
-                print(f"{class_name}: {found}")
-        return
-    time.sleep(5)
+            print(f"Unchanged: '{output_file}'")
+        count_note("unchanged")
+        return session_urls
+    if path.isfile(output_file) and not (overwrite or state):
+        print(f"Won't overwrite existing paper file: '{output_file}'")
+        return session_urls
+    if debug:
+        print(f"Filename: '{filename}'")
+        print(f"Filename (md): '{filename_md}'")
+
+    if not fields["author_list2"]:
+        print("    (No author list found)")
+    with span("render", url=url, session=fields["parent_session_code"]):
+        text = render_presentation(fields)
+    replace_note(output_file, text)
+    if state:
+        state.record_written(url, output_file, record)
+
+    return session_urls
+
+
+def get_session(url, tz, browser=None, has_abstract=True):
+    pipeline = Pipeline(tz)
+    pipeline.run(pipeline.session, url, browser=browser, has_abstract=has_abstract)
 
-    session_code = browser.find_elements(By.CLASS_NAME, "finalNumber")
+
+def session_fields(url, record):
+    """
+    Work out everything that goes in a session's note from its record. Its "rows" are
+    the lines of its table of presentations (or list of panelists): dicts with the
+    row's "text" and, if the presentation needs its own note, its "url", "title" and
+    "filename".
+    """
+    session_code = record["final_number"]
     if not session_code:
-        field_goodtype = browser.find_element(By.CLASS_NAME, "field_GoodType").text
+        field_goodtype = record["good_type"] or ""
         if "Keynote" in field_goodtype:
             urlsplit = url.split("/")
             session_code = "K" + urlsplit[-1]
@@ -448,265 +2810,376 @@ def get_session(url, tz, browser=None, has_abstract=True):
                 f"No session code found (class finalNumber, field_goodtype {field_goodtype})"
             )
             session_code = None
+    session_title = record["title"]
+    if session_code:
+        session_title = session_title.replace(session_code + " - ", "")
+    is_poster = "Poster" in session_title
+    with span("filename", url=url, session=session_code):
+        filename = session_filename(url, session_code, session_title)
+
+    session_daydate = record["slot_date"]
+    session_time = record["slot_time"]
+    session_location = record["location"]
+    if debug:
+        print(session_daydate)
+        print(session_time)
+        print(session_location)
+
+    session_abstract = record["subtitle"]
+    session_abstract = session_abstract.replace("\n", "\n\n")
+    session_abstract = session_abstract.replace("\n\n\n", "\n\n")
+
+    session_leaders = record["leaders"]
+    if session_leaders is not None:
+        with span("get_people", url=url, session=session_code):
+            person_names2, affil_list = get_people(session_leaders)
+    else:
+        if debug:
+            print("field_ChildList_Role not found; i.e., no people/affiliations")
+        person_names2 = affil_list = None
+
+    is_panel_discussion = False
+    rows = []
+    for paper in record["papers"] or []:
+        paper_starttime = paper["start_time"]
+        paper_number = paper["number"]
+        if not paper_number:
+            paper_number = f"{session_code}-XX"
+        paper_title = paper["title"]
+        if debug:
+            print(f"paper_title: '{paper_title}'")
+        paper_presenter = None
+
+        # Panel discussions: Skip moderator and panelists
+        # E.g., https://agu.confex.com/agu/fm22/meetingapp.cgi/Session/161615
+        if any(x in paper_title for x in ["Moderator:", "Panelist:"]):
+            if "\n" in paper_title:
+                paper_title = paper_title.split("\n")[0]
+            row_text = ""
+            if not is_panel_discussion:
+                is_panel_discussion = True
+                row_text += f"\n\n## Panel discussion\n"
+                row_text += f"### Participants\n"
+            row_text += f"- {paper_title}\n"
+            rows.append({"text": row_text, "participant": paper_title})
+            continue
+
+        if "\n" in paper_title:
+            paper_title_split = paper_title.split("\n")
+            paper_title = paper_title_split[0]
+            paper_title_split = paper_title_split[1:]
+            if debug:
+                print(f"paper_title: '{paper_title}'")
+                print(f"paper_title_split: '{paper_title_split}'")
+            paper_presenter = paper_title_split[0]
+            if "(Invited)" in paper_title_split:
+                paper_title = paper_title + " (Invited)"
+                paper_title_split.remove("(Invited)")
+            ignored_info = None
+            if len(paper_title_split) > 1:
+                ignored_info = paper_title_split[1:]
+        if not paper_presenter:
+            paper_presenter = ""
+
+        paper_title = paper_title.replace(paper_number + " ", "")
+
+        if debug:
+            print(f"{paper_title} ({paper_presenter})")
+            if ignored_info:
+                print(f"Ignoring extra info: {ignored_info}")
+
+        paper_url = paper["url"]
+
+        row = {}
+        if paper_title not in [
+            "Introduction",
+            "Conclusions",
+            "Q&A",
+            "Discussion",
+            "Panel Discussion",
+            "Break",
+        ] and not any(x in paper_title for x in ["Remarks", "Q & A"]):
+            with span("filename", url=paper_url, session=session_code):
+                paper_filename = get_filename_allocator().allocate(
+                    filename, paper_number, paper_title, normalize_url(paper_url)
+                )
+            paper_3rdcell_text = f"[[{paper_filename}]] ([URL]({paper_url}))"
+            row["url"] = paper_url
+            row["title"] = paper_title
+            row["filename"] = paper_filename
+        else:
+            paper_3rdcell_text = paper_title
+
+        if paper["cancelled"]:
+            if not is_poster:
+                paper_starttime = f"~~{paper_starttime}~~"
+            paper_presenter = f"~~{paper_presenter}~~"
+            paper_3rdcell_text = f"~~{paper_3rdcell_text}~~"
+
+        if paper_presenter == session_location:
+            paper_presenter = ""
+
+        if is_poster:
+            row["text"] = f"| {paper_presenter} | {paper_3rdcell_text} |\n"
+        else:
+            row["text"] = (
+                f"| {paper_starttime} | {paper_presenter} | {paper_3rdcell_text} |\n"
+            )
+        rows.append(row)
+
+    return {
+        "url": url,
+        "session_code": session_code,
+        "session_title": session_title,
+        "filename": filename,
+        "is_poster": is_poster,
+        "has_papers": record["papers"] is not None,
+        "person_names2": person_names2,
+        "affil_list": affil_list,
+        "session_time": session_time,
+        "session_daydate": session_daydate,
+        "session_location": session_location,
+        "session_abstract": session_abstract,
+        "is_panel_discussion": is_panel_discussion,
+        "rows": rows,
+    }
+
+
+def render_session(fields):
+    """
+    Get the Markdown for a session's note from session_fields()
+    """
+    lines = [
+        f"#seminar #AGU{thisYear} #AGU\n",
+        f"# [{fields['session_title']}]({fields['url']})\n",
+    ]
+    if fields["person_names2"]:
+        lines.append(f"{fields['person_names2']}\n")
+    if fields["affil_list"]:
+        lines.append(f"{fields['affil_list']}\n\n")
+    lines.append(f"{fields['session_time']} {fields['session_daydate']}\n")
+    lines.append(f"{fields['session_location']}\n\n")
+    lines.append("## Description\n")
+    lines.append("### Abstract\n")
+    lines.append(f"{fields['session_abstract']}\n\n")
+    # if pl_summary:
+    #     lines.append("### Plain-language summary\n")
+    #     lines.append(f"{pl_summary}\n")
+    lines.append("\n")
+    if fields["has_papers"]:
+        if fields["is_poster"]:
+            lines.append("## Posters\n\n")
+            lines.append("| Pres. author | Title |\n")
+            lines.append("| ----- | --- |\n")
+        else:
+            lines.append("## Presentations\n\n")
+            lines.append("| Time | Pres. author | Title |\n")
+            lines.append("| ---- | ----- | --- |\n")
+    lines.extend(row["text"] for row in fields["rows"])
+    if fields["is_panel_discussion"]:
+        lines.append("\n\n### Panel notes\n")
     else:
-        session_code = session_code[0].text
-    session_title = browser.find_element(By.CLASS_NAME, "favoriteItem").text
-    if session_code:
-        session_title = session_title.replace(session_code + " - ", "")
-    print(f"Importing session: {session_title}")
-    is_poster = "Poster" in session_title
+        lines.append("\n\n## Session notes\n")
+    lines.append("- \n\n\n")
+    return "".join(lines)
 
-    # Some sessions (e.g., https://agu.confex.com/agu/fm21/meetingapp.cgi/Session/142602) have no children, so they will be in the top level instead of their own subdirectory.
-    field_ChildList_PaperSlot = browser.find_elements(
-        By.CLASS_NAME, "field_ChildList_PaperSlot"
-    )
-    if field_ChildList_PaperSlot:
-        field_ChildList_PaperSlot = field_ChildList_PaperSlot[0]
 
-    # Get directory name
-    # Replace illegal characters for Obsidian filenames
-    filename = codetitle_to_filename(session_code, session_title)
+def session_note_path(fields):
+    """
+    Get the directory for a session's presentations (None if it has none) and the
+    path of its note, from session_fields()
+    """
+    # Some sessions (e.g., https://agu.confex.com/agu/fm21/meetingapp.cgi/Session/142602) have no children, so they will be in the top level instead of their own subdirectory.
+    filename = fields["filename"]
     dirname = None
-    if field_ChildList_PaperSlot:
+    output_file = filename + ".md"
+    if fields["has_papers"]:
         dirname = filename
-        if path.exists(dirname) and not overwrite:
-            print(f"Won't overwrite existing session dir: '{dirname}'")
-            return
-        makedirs(dirname, exist_ok=True)
+        output_file = path.join(dirname, "_" + output_file)
+    return dirname, output_file
 
-    # Get filename
-    output_file = filename + ".md"
+
+def begin_session_note(url, record):
+    """
+    Work out a session's note from its record, and where it goes. Returns a dict
+    describing the note, with its rows (see session_fields()) for getting its
+    presentations before finish_session_note() writes it. A note that's unchanged (in
+    incremental mode) or already exists (unless overwrite = true) won't be written
+    ("write" is False), but its rows are still returned so that presentations missing
+    from an interrupted run are gotten.
+    """
+    state = get_state_store()
+    fields = session_fields(url, record)
+    print(f"Importing session: {fields['session_title']}")
+
+    dirname, output_file = session_note_path(fields)
+    if people_notes and record["leaders"]:
+        note_name = path.splitext(path.basename(output_file))[0]
+        get_people_index().add_note(note_name, record["leaders"])
     if dirname:
-        output_file = path.join(dirname, "_" + output_file)
-    output_file = truncate_filename(output_file)
+        makedirs(dirname, exist_ok=True)
     if debug:
         print(f"Filename: {output_file}")
 
-    if path.isfile(output_file):
-        if not overwrite:
-            print(f"Won't overwrite existing session file: '{output_file}'")
-            return
-        do_replace(output_file)
+    write = True
+    if state and state.is_current(url, output_file, record):
+        if debug:
+            print(f"Unchanged: '{output_file}'")
+        count_note("unchanged")
+        write = False
+    elif path.isfile(output_file) and not (overwrite or state):
+        print(f"Won't overwrite existing session file: '{output_file}'")
+        write = False
 
-    session_whenwhere = browser.find_element(By.CLASS_NAME, "field_ParentList_SlotData")
-    session_daydate = session_whenwhere.find_element(By.CLASS_NAME, "SlotDate").text
-    session_time = session_whenwhere.find_element(By.CLASS_NAME, "SlotTime").text
-    session_location = session_whenwhere.find_element(
-        By.CLASS_NAME, "propertyInfo"
-    ).text
-    if debug:
-        print(session_daydate)
-        print(session_time)
-        print(session_location)
+    for row in fields["rows"]:
+        if "participant" in row:
+            print(f"Adding {row['participant']}")
 
-    session_abstract = browser.find_element(By.CLASS_NAME, "field_SubTitle").text
-    session_abstract = session_abstract.replace("\n", "\n\n")
-    session_abstract = session_abstract.replace("\n\n\n", "\n\n")
+    return {
+        "url": url,
+        "record": record,
+        "fields": fields,
+        "write": write,
+        "output_file": output_file,
+        "dirname": dirname,
+        "rows": fields["rows"],
+    }
 
-    childlist_role = browser.find_elements(By.CLASS_NAME, "field_ChildList_Role")
-    if childlist_role:
-        session_leaders = childlist_role[0].find_elements(By.CLASS_NAME, "RoleListItem")
-        person_names2, affil_list = get_people(session_leaders)
-    else:
-        if debug:
-            print("field_ChildList_Role not found; i.e., no people/affiliations")
-        session_leaders = person_names2 = affil_list = None
-
-    if not path.isfile(output_file) or overwrite:
-        with open(output_file, "w") as outFile:
-            outFile.write(f"#seminar #AGU{thisYear} #AGU\n")
-            outFile.write(f"# [{session_title}]({url})\n")
-            if person_names2:
-                outFile.write(f"{person_names2}\n")
-            if affil_list:
-                outFile.write(f"{affil_list}\n\n")
-            outFile.write(f"{session_time} {session_daydate}\n")
-            outFile.write(f"{session_location}\n\n")
-            outFile.write("## Description\n")
-            outFile.write("### Abstract\n")
-            outFile.write(f"{session_abstract}\n\n")
-            # if pl_summary:
-            #     outFile.write("### Plain-language summary\n")
-            #     outFile.write(f"{pl_summary}\n")
-            outFile.write("\n")
-            if field_ChildList_PaperSlot:
-                if is_poster:
-                    outFile.write("## Posters\n\n")
-                    outFile.write("| Pres. author | Title |\n")
-                    outFile.write("| ----- | --- |\n")
-                else:
-                    outFile.write("## Presentations\n\n")
-                    outFile.write("| Time | Pres. author | Title |\n")
-                    outFile.write("| ---- | ----- | --- |\n")
 
-    is_panel_discussion = False
-    if field_ChildList_PaperSlot:
-        session_papers = field_ChildList_PaperSlot.find_elements(
-            By.CLASS_NAME, "entryInformation"
-        )
-        for paper in session_papers:
-            paper_starttime = paper.find_elements(By.CLASS_NAME, "SlotTime")
-            if paper_starttime:
-                paper_starttime = paper_starttime[0].text
-            else:
-                paper_starttime = ""
-            paper_number = find_or_none(paper, "SessionListNumber")
-            if not paper_number:
-                paper_number = f"{session_code}-XX"
-            paper_title = paper.find_element(By.CLASS_NAME, "Title").text
-            if debug:
-                print(f"paper_title: '{paper_title}'")
-            paper_presenter = None
-
-            # Panel discussions: Skip moderator and panelists
-            # E.g., https://agu.confex.com/agu/fm22/meetingapp.cgi/Session/161615
-            if any(x in paper_title for x in ["Moderator:", "Panelist:"]):
-                if "\n" in paper_title:
-                    paper_title = paper_title.split("\n")[0]
-                print(f"Adding {paper_title}")
-                with open(output_file, "a") as outFile:
-                    if not is_panel_discussion:
-                        is_panel_discussion = True
-                        outFile.write(f"\n\n## Panel discussion\n")
-                        outFile.write(f"### Participants\n")
-                    outFile.write(f"- {paper_title}\n")
-                continue
+def finish_session_note(note):
+    """
+    Write a session's note from begin_session_note(), archiving any old version that
+    differs
+    """
+    if not note["write"]:
+        return
+    output_file = note["output_file"]
+    with span("render", url=note["url"], session=note["fields"]["session_code"]):
+        text = render_session(note["fields"])
+    replace_note(output_file, text)
+    state = get_state_store()
+    if state:
+        state.record_written(note["url"], output_file, note["record"])
 
-            if "\n" in paper_title:
-                paper_title_split = paper_title.split("\n")
-                paper_title = paper_title_split[0]
-                paper_title_split = paper_title_split[1:]
-                if debug:
-                    print(f"paper_title: '{paper_title}'")
-                    print(f"paper_title_split: '{paper_title_split}'")
-                paper_presenter = paper_title_split[0]
-                if "(Invited)" in paper_title_split:
-                    paper_title = paper_title + " (Invited)"
-                    paper_title_split.remove("(Invited)")
-                ignored_info = None
-                if len(paper_title_split) > 1:
-                    ignored_info = paper_title_split[1:]
-            if not paper_presenter:
-                paper_presenter = ""
-
-            paper_title = paper_title.replace(paper_number + " ", "")
 
-            if debug:
-                print(f"{paper_title} ({paper_presenter})")
-                if ignored_info:
-                    print(f"Ignoring extra info: {ignored_info}")
-
-            paper_filename = codetitle_to_filename(paper_number, paper_title)
-            paper_filename = truncate_filename(paper_filename + ".md")
-            paper_filename = paper_filename[:-3]
-            paper_url = paper.find_element(By.TAG_NAME, "a").get_attribute("href")
-
-            if paper_title not in [
-                "Introduction",
-                "Conclusions",
-                "Q&A",
-                "Discussion",
-                "Panel Discussion",
-                "Break",
-            ] and not any(x in paper_title for x in ["Remarks", "Q & A"]):
-                paper_3rdcell_text = f"[[{paper_filename}]] ([URL]({paper_url}))"
-                try:
-                    if not browser2:
-                        browser2 = start_browser(tz)
-                except:
-                    browser2 = start_browser(tz)
-                try:
-                    get_presentation(
-                        paper_url,
-                        [],
-                        tz,
-                        browser2,
-                        title=paper_title,
-                        has_abstract=has_abstract,
-                        dirname=dirname,
-                    )
-                except Exception as e:
-                    raise RuntimeError(
-                        f"Failed to get presentation from {paper_url}"
-                    ) from e
+class PeopleIndex:
+    """
+    Every person and institution seen this run, each stored once however many notes
+    they're in. With people_notes = true, it also keeps a note for each of them,
+    listing the notes they're in; each is added to as new ones are found, without
+    reading any other notes.
+    """
 
-            else:
-                paper_3rdcell_text = paper_title
+    def __init__(self, people_dir="People", institutions_dir="Institutions"):
+        self.ids = {}  # Name or institution: ID
+        self.texts = []  # ID: name or institution
+        self.dirs = {"person": people_dir, "institution": institutions_dir}
+        self.linked = {}  # (kind, ID): names of the notes its note links to
+        self.lock = Lock()
 
-            paper_cancelled = find_or_none(paper, "cancelled")
-            if paper_cancelled:
-                if not is_poster:
-                    paper_starttime = f"~~{paper_starttime}~~"
-                paper_presenter = f"~~{paper_presenter}~~"
-                paper_3rdcell_text = f"~~{paper_3rdcell_text}~~"
+    def intern(self, text):
+        """
+        Get the ID of a name or institution
+        """
+        text_id = self.ids.get(text)
+        if text_id is None:
+            with self.lock:
+                text_id = self.ids.setdefault(text, len(self.texts))
+                if text_id == len(self.texts):
+                    self.texts.append(text)
+        return text_id
 
-            if paper_presenter == session_location:
-                paper_presenter = ""
+    def add_note(self, note_name, people):
+        """
+        Add a link to the note named note_name to the notes of the people and
+        institutions in it, from (name, institution) pairs
+        """
+        for name, institution in people:
+            self._link("person", name, note_name)
+            if institution:
+                self._link("institution", institution, note_name)
 
-            with open(output_file, "a") as outFile:
-                if is_poster:
-                    outFile.write(f"| {paper_presenter} | {paper_3rdcell_text} |\n")
-                else:
-                    outFile.write(
-                        f"| {paper_starttime} | {paper_presenter} | {paper_3rdcell_text} |\n"
-                    )
-        try:
-            browser2.quit()
-        except:
-            pass
+    def _link(self, kind, text, note_name):
+        key = (kind, self.intern(text))
+        if note_name in self.linked.get(key, ()):
+            return
+        folder = self.dirs[kind]
+        name = get_filename_allocator().allocate(folder, None, text, text)
+        note_file = path.join(folder, name + ".md")
+        with self.lock, notes_lock():
+            if key not in self.linked:
+                self.linked[key] = self._read_links(note_file, kind, text)
+            if note_name in self.linked[key]:
+                return
+            self.linked[key].add(note_name)
+            with open(note_file, "a", encoding="utf-8") as f:
+                f.write(f"- [[{note_name}]]\n")
 
-    with open(output_file, "a") as outFile:
-        if is_panel_discussion:
-            outFile.write("\n\n### Panel notes\n")
-        else:
-            outFile.write("\n\n## Session notes\n")
-        outFile.write("- \n\n\n")
+    def _read_links(self, note_file, kind, text):
+        """
+        Get the notes a person's or institution's note already links to, starting
+        the note if there isn't one
+        """
+        if not path.isfile(note_file):
+            makedirs(path.dirname(note_file), exist_ok=True)
+            with open(note_file, "w", encoding="utf-8") as f:
+                f.write(f"#{kind} #AGU{thisYear} #AGU\n# {text}\n\n")
+            return set()
+        with open(note_file, encoding="utf-8") as f:
+            return set(re.findall(r"^- \[\[(.*)\]\]$", f.read(), re.MULTILINE))
 
+    def summary(self):
+        n_people = len({i for kind, i in self.linked if kind == "person"})
+        return (
+            f"People notes: {n_people} people and {len(self.linked) - n_people}"
+            " institutions"
+        )
 
-def get_people(session_leaders):
-    person_names = []
-    person_affils_all = []
-    person_affils = []
-    person_nameaffils = []
-    for person in session_leaders:
-        person_name = person.find_element(By.TAG_NAME, "a").text
-        if person_name in person_names:
-            continue
-        person_nameaffil = person_name
-        person_affil = person.find_elements(By.CLASS_NAME, "Affiliation")
-        if not person_affil:
-            person_affil = None
-        else:
-            person_affil = person_affil[0].text.replace("\n", "; ")
-            person_nameaffil = person_nameaffil + person_affil
-        if person_nameaffil in person_nameaffils:
+
+def get_people_index():
+    """
+    Get the PeopleIndex for this run, making it if needed
+    """
+    global people_index
+    if people_index is None:
+        people_index = PeopleIndex()
+    return people_index
+
+
+def number_people(people, unique=False):
+    """
+    Given a list of (name, institution) tuples, get the list of names, each with the
+    number of their institution, and the numbered list of institutions; e.g., "A (1),
+    B (2), C (1)" and "(1) X, (2) Y". Institutions are numbered in the order they
+    first appear. With unique, a name is only listed the first time it appears.
+    """
+    index = get_people_index()
+    seen = set()
+    numbers = {}  # Institution ID: its number
+    names = []
+    institutions = []
+    for name, institution in people:
+        name_id = index.intern(name)
+        if unique:
+            if name_id in seen:
+                continue
+            seen.add(name_id)
+        if not institution:
+            names.append(name)
             continue
-        person_nameaffils = person_nameaffils + [person_nameaffil]
-        person_names = person_names + [person_name]
-        person_affils_all = person_affils_all + [person_affil]
-        if person_affil:
-            if person_affil not in person_affils:
-                person_affils = person_affils + [person_affil]
-        # print(f"{person_name} ({person_affil})")
-    person_names2 = ""
-    for p, person in enumerate(person_names):
-        inst = person_affils_all[p]
-        if inst:
-            inst_num = person_affils.index(inst) + 1
-            person_names2 = person_names2 + f"{person} ({inst_num})"
-        else:
-            person_names2 = person_names2 + f"{person}"
-        if p < len(session_leaders) - 1:
-            person_names2 = person_names2 + ", "
-    affil_list = ""
-    for a, affil in enumerate(person_affils):
-        affil_list = affil_list + f"({a+1}) {affil}"
-        if a < len(person_affils) - 1:
-            affil_list = affil_list + ", "
-    if person_names2[-2:] == ", ":
-        person_names2 = person_names2[:-2]
-    if affil_list[-2:] == ", ":
-        affil_list = affil_list[:-2]
+        institution_id = index.intern(institution)
+        if institution_id not in numbers:
+            numbers[institution_id] = len(numbers) + 1
+            institutions.append(f"({numbers[institution_id]}) {institution}")
+        names.append(f"{name} ({numbers[institution_id]})")
+    return ", ".join(names), ", ".join(institutions)
+
+
+def get_people(session_leaders):
+    """
+    Given a list of (name, affiliation) tuples, get the people and affiliation lists
+    """
+    person_names2, affil_list = number_people(session_leaders, unique=True)
     if debug:
         print(person_names2)
         print(affil_list)
@@ -733,27 +3206,90 @@ def translate_ativ_to_confex(url_in):
     return url_out
 
 
+def normalize_url(url):
+    """
+    Get the canonical form of a page's URL, e.g. for use as a key
+    """
+    url = url.strip()
+    # AGU25 scheduler URLs start with this, but they can be translated into the old-style URLs
+    if url.startswith("https://eppro01.ativ.me"):
+        # Find the word after "tid=" in the url
+        url = translate_ativ_to_confex(url)
+    parts = urlsplit(url)
+    return urlunsplit(
+        (
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path.rstrip("/"),
+            parts.query,
+            "",
+        )
+    )
+
+
+def read_ics_components(ics_file, names=("VEVENT", "VTIMEZONE")):
+    """
+    Yield (name, text) for each top-level component of a .ics file with one of the
+    given names, reading one line at a time
+    """
+    depth = 0
+    block = None
+    with open(ics_file, "rb") as f:
+        for line in f:
+            # Folded (continuation) lines start with whitespace, so they never match
+            content = line.rstrip(b"\r\n").upper()
+            if content.startswith(b"BEGIN:"):
+                depth += 1
+                name = content[6:].decode()
+                # Depth 1 is VCALENDAR itself
+                if depth == 2 and name in names:
+                    block_name = name
+                    block = []
+            if block is not None:
+                block.append(line)
+            if content.startswith(b"END:"):
+                depth -= 1
+                if depth == 1 and block is not None:
+                    yield block_name, b"".join(block)
+                    block = None
+
+
 def parse_ics(ics_file, tz):
     """
     Given an AGU schedule in the form of a .ics file, extract schedule URLs
     Converts event datetimes to the specified timezone
+    This is a generator: URLs are yielded as events are read, so work on them can
+    start before the whole file has been read, and memory use doesn't grow with it.
     """
-    from icalendar import Calendar
+    from icalendar import Event, Timezone
 
     if debug:
         print(f"Getting URLs from file: '{ics_file}")
-    with open(ics_file, "rb") as f:
-        cal = Calendar.from_ical(f.read())
 
     # Create timezone object for conversion
     target_tz = ZoneInfo(tz)
 
-    url_list = []
-    for component in cal.walk("VEVENT"):
+    # Time zones defined in the file (these come before the events that use them)
+    ics_timezones = {}
+
+    for component_name, block in read_ics_components(ics_file):
+        if component_name == "VTIMEZONE":
+            try:
+                ics_timezone = Timezone.from_ical(block)
+                ics_timezones[str(ics_timezone["TZID"])] = ics_timezone.to_tz()
+            except Exception as e:
+                if debug:
+                    print(f"{INDENT}Couldn't read time zone from file: {e}")
+            continue
+        component = Event.from_ical(block)
         summary = component.get("SUMMARY")
 
         # Get event start time and convert to target timezone
         start = component.decoded("dtstart")
+        start_tzid = component["dtstart"].params.get("TZID")
+        if getattr(start, "tzinfo", True) is None and start_tzid in ics_timezones:
+            # Naive datetime in a time zone defined in the file
+            start = start.replace(tzinfo=ics_timezones[start_tzid])
 
         # Convert to target timezone if it's a datetime object
         if hasattr(start, "astimezone"):
@@ -795,48 +3331,807 @@ def parse_ics(ics_file, tz):
                 (1 + int(debug)) * INDENT + f"Unable to get URL from event: {summary}"
             )
             continue
-        url = url.group(1)
-        url_list.append(url)
+        yield url.group(1)
 
-    return url_list
 
+class Pipeline:
+    """
+    Runs pages through fetch, extract and render (note-writing) stages. Each stage
+    runs in worker threads, with its own limit on how many pages can be in it at once,
+    so that one page's loading overlaps with other pages' extraction and writing.
+    """
 
-def main():
-    tz = get_tz(thisYear)
-    try:
-        if not browser:
-            browser = start_browser(tz)
-    except:
-        browser = start_browser(tz)
+    def __init__(self, tz):
+        self.tz = tz
+        self.limits = {
+            "fetch": fetch_concurrency,
+            "extract": extract_concurrency,
+            "render": render_concurrency,
+        }
+        self.semaphores = None
+        self.session_locks = None
+        self.loads = {}  # Normalized URL: task loading its record
+        self.n_children = {}  # Normalized session URL: number of presentations
+        self.input_counts = Counter()  # Normalized URL: times given
+        self.plan = {}  # Normalized session URL: [presentation URLs given]
+        self.session_tasks = {}  # Normalized session URL: task processing it
+        self.items = set()  # Normalized URLs given, for the journal
+        self.done = []  # Normalized URLs given that have been done
+        self.failures = {}  # Normalized URL: error, for URLs that failed
+        # Normalized URL: seconds spent fetching, extracting and writing it, not
+        # counting waits for a stage or a browser
+        self.work_seconds = Counter()
 
-    url_list = sys.argv[1:]
-    if len(url_list) == 1 and url_list[0].endswith(".ics"):
-        url_list = parse_ics(url_list[0], tz)
-    elif any(u.endswith(".ics") for u in url_list):
-        raise RuntimeError("Can only read .ics file if it's the only argument given")
+    def run(self, coro_func, *args, **kwargs):
+        """
+        Run a coroutine method of this Pipeline to completion
+        """
+
+        async def runner():
+            # Enough threads that a stage is never starved by others waiting on
+            # browsers
+            asyncio.get_running_loop().set_default_executor(
+                ThreadPoolExecutor(max_workers=sum(self.limits.values()) + 1)
+            )
+            self.semaphores = {k: asyncio.Semaphore(v) for k, v in self.limits.items()}
+            self.session_locks = defaultdict(asyncio.Lock)
+            return await coro_func(*args, **kwargs)
+
+        return asyncio.run(runner())
+
+    async def stage(self, name, func, *args, **kwargs):
+        async with self.semaphores[name]:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def timed_stage(self, url, name, func, *args, **kwargs):
+        """
+        Like stage(), adding how long func takes to url's work_seconds, less any
+        time it spent waiting for a browser to be free
+        """
+
+        def timed():
+            waited = getattr(browser_waits, "seconds", 0.0)
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                waited = getattr(browser_waits, "seconds", 0.0) - waited
+                seconds = time.perf_counter() - start_time - waited
+                self.work_seconds[normalize_url(url)] += seconds
+
+        return await self.stage(name, timed)
+
+    async def load(self, url, kind, browser=None, has_abstract=True):
+        """
+        Get a page's record, loading each page at most once per run
+        """
+        key = normalize_url(url)
+        if key not in self.loads:
+            self.loads[key] = asyncio.ensure_future(
+                self._load(url, kind, browser, has_abstract)
+            )
+        return await self.loads[key]
+
+    async def _load(self, url, kind, browser, has_abstract):
+        if debug:
+            print("URL: " + url)
+        record = await asyncio.to_thread(lookup_record, url)
+        if record is not None:
+            return record
+        page = await self.timed_stage(
+            url,
+            "fetch",
+            fetch_page,
+            url,
+            self.tz,
+            kind,
+            browser,
+            has_abstract=has_abstract,
+        )
+        try:
+            record = await self.timed_stage(url, "extract", extract_page, page, self.tz)
+        except NeedsBrowser as e:
+            # Back through the fetch stage, so the extract stage never waits for a
+            # browser
+            print(f"{INDENT}{e}; using browser")
+            page = await self.timed_stage(
+                url,
+                "fetch",
+                fetch_page,
+                url,
+                self.tz,
+                kind,
+                has_abstract=has_abstract,
+                use_http=False,
+            )
+            record = await self.timed_stage(url, "extract", extract_page, page, self.tz)
+        await asyncio.to_thread(remember_record, url, kind, record, page["partial"])
+        return record
 
-    for url in url_list:
-        # AGU25 scheduler URLs start with this, but they can be translated into the old-style URLs
-        if url.startswith("https://eppro01.ativ.me"):
-            # Find the word after "tid=" in the url
-            url = translate_ativ_to_confex(url)
+    async def presentation(self, url, session_urls, **kwargs):
+        """
+        Like get_presentation()
+        """
+        if kwargs.get("title"):
+            print(f"Importing presentation: {kwargs['title']}")
+        record = await self.load(
+            url, "Paper", has_abstract=kwargs.get("has_abstract", True)
+        )
+        return await self.timed_stage(
+            url, "render", write_presentation, url, session_urls, record, **kwargs
+        )
+
+    async def child_presentation(self, url, **kwargs):
+        """
+        Get a session's child presentation
+        """
+        try:
+            await self.presentation(url, [], **kwargs)
+        except Exception as e:
+            raise RuntimeError(f"Failed to get presentation from {url}") from e
+
+    async def session(self, url, browser=None, has_abstract=True):
+        """
+        Like get_session(). Returns the normalized URLs of the presentations it got.
+        Raises if the session or any of its presentations failed, so that it isn't
+        taken as done.
+        """
+        async with self.session_locks[url]:
+            record = await self.load(url, "Session", browser)
+            if record is None:
+                raise RuntimeError("Session page never finished loading")
+            note = await self.stage("render", begin_session_note, url, record)
+            rows = [row for row in note["rows"] if "url" in row]
+            child_urls = [row["url"] for row in rows]
+            self.n_children[normalize_url(url)] = len(child_urls)
+            if not (overwrite or get_state_store()):
+                # Skip presentations already written, e.g. by an interrupted run
+                rows = [
+                    row
+                    for row in rows
+                    if not path.isfile(
+                        path.join(note["dirname"], row["filename"] + ".md")
+                    )
+                ]
+                if len(rows) < len(child_urls):
+                    print(
+                        f"{INDENT}{len(child_urls) - len(rows)} presentation note(s)"
+                        " already exist; won't overwrite them"
+                    )
+
+            # Get presentations in parallel; rows are written in their original order
+            # once all are done
+            start_time = time.perf_counter()
+            results = await asyncio.gather(
+                *(
+                    self.child_presentation(
+                        row["url"],
+                        title=row["title"],
+                        has_abstract=has_abstract,
+                        dirname=note["dirname"],
+                    )
+                    for row in rows
+                ),
+                return_exceptions=True,
+            )
+            await self.stage("render", finish_session_note, note)
+
+        # A presentation that failed doesn't stop the rest of its session
+        n_failed = 0
+        work_seconds = 0.0
+        for row, result in zip(rows, results):
+            if isinstance(result, Exception):
+                self.failed(row["url"], result)
+                n_failed += 1
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                work_seconds += self.work_seconds[normalize_url(row["url"])]
+
+        if len(rows) > n_failed:
+            # How long getting them one at a time would have taken, compared to how
+            # long it took
+            wall_seconds = time.perf_counter() - start_time
+            speedup = work_seconds / wall_seconds
+            print(
+                f"Got {len(rows) - n_failed} presentations in {wall_seconds:.1f} s"
+                f" with up to {fetch_concurrency} at once ({speedup:.1f}x speedup over"
+                " one at a time)"
+            )
+        if n_failed:
+            raise RuntimeError(f"{n_failed} of its presentation(s) failed")
+        return {normalize_url(x) for x in child_urls}
+
+    def failed(self, url, e):
+        print(f"Failed: {url}\n{INDENT}{error_text(e)}")
+        self.failures[normalize_url(url)] = error_text(e)
+        if journal:
+            journal.failed(url, e)
 
+    async def get_session_url(self, url):
+        """
+        Get the URL of a page's session: itself if it's a session, otherwise its
+        parent (loading it to find out)
+        """
         entrytype = url.split("/")[-2]
         if debug:
             print(f"entrytype: {entrytype}")
-
         if entrytype == "Session":
-            session_url = url
-        else:
+            return url
+        try:
+            record = await self.load(url, "Paper")
+        except Exception as e:
+            raise RuntimeError(f"Failed to get presentation from {url}") from e
+        return normalize_url(record["parent_url"])
+
+    async def process_session(self, session_url):
+        try:
+            return await self.session(session_url, has_abstract=True)
+        except Exception as e:
+            raise RuntimeError(f"Failed to get session from {session_url}") from e
+
+    async def process_url(self, url):
+        """
+        Add a URL to the plan, which groups URLs by session so that each session is
+        processed once however many of its URLs are given
+        """
+        url = normalize_url(url)
+        self.input_counts[url] += 1
+        if self.input_counts[url] > 1:
+            return
+        session_url = await self.get_session_url(url)
+        self.plan.setdefault(session_url, [])
+        if url != session_url:
+            self.plan[session_url].append(url)
+        if session_url not in self.session_tasks:
+            self.session_tasks[session_url] = asyncio.ensure_future(
+                self.process_session(session_url)
+            )
+        child_urls = await self.session_tasks[session_url]
+
+        # A presentation that was asked for but that its session didn't get (e.g.,
+        # because the session's notes already exist)
+        if url != session_url and url not in child_urls:
             try:
-                session_url = get_presentation(url, [], tz)[0]
+                await self.presentation(url, [])
             except Exception as e:
                 raise RuntimeError(f"Failed to get presentation from {url}") from e
+
+    async def read_listings(self, start_urls, checkpoint):
+        """
+        Find every session of a meeting by reading its program listing pages, and the
+        listing pages linked from those, recording them all in checkpoint. Pages
+        already read (e.g., before a crawl was stopped) aren't read again; ones that
+        failed are tried again, once, and if one fails the others are still read.
+        """
+        await asyncio.to_thread(checkpoint.retry_failed_listings)
+        await asyncio.to_thread(checkpoint.add_listings, start_urls)
+        prefix = start_urls[0].split("/meetingapp.cgi/")[0] + "/meetingapp.cgi/"
+        while True:
+            unread = await asyncio.to_thread(checkpoint.unread_listings)
+            if not unread:
+                break
+            n_listings = await asyncio.to_thread(checkpoint.n_listings)
+            print(f"Reading {len(unread)} program listing page(s) ({n_listings} found)")
+
+            async def read_listing(url):
+                try:
+                    record = await self.load(url, "Listing")
+                except Exception as e:
+                    # Marked as failed, so it's tried again when the crawl is resumed
+                    await asyncio.to_thread(self.failed, url, e)
+                    await asyncio.to_thread(checkpoint.listing_failed, url)
+                    return
+                session_urls = []
+                listing_urls = []
+                for link in (record or {"links": []})["links"]:
+                    link = normalize_url(link)
+                    if not link.startswith(prefix):
+                        continue
+                    kind = link[len(prefix) :].split("/")[0]
+                    if kind == "Session":
+                        session_urls.append(link)
+                    elif kind not in CRAWL_SKIP_KINDS:
+                        listing_urls.append(link)
+                if n_listings >= CRAWL_MAX_LISTINGS:
+                    listing_urls = []
+                await asyncio.to_thread(
+                    checkpoint.listing_read, url, session_urls, listing_urls
+                )
+
+            await asyncio.gather(*(read_listing(url) for url in unread))
+
+        n_failed = await asyncio.to_thread(checkpoint.n_failed_listings)
+        if n_failed:
+            print(
+                f"Crawl: {n_failed} program listing page(s) failed; sessions only on"
+                " those are left out until the crawl is resumed"
+            )
+
+    async def crawl(self, meeting, checkpoint, shard=(1, 1)):
+        """
+        Get every session of a meeting (or, with shard, the sessions in that shard),
+        skipping those that checkpoint says are done
+        """
+        await self.read_listings(crawl_start_urls(meeting), checkpoint)
+        sessions = await asyncio.to_thread(checkpoint.sessions)
+        todo = [
+            url for url, done in sessions.items() if not done and in_shard(url, shard)
+        ]
+        print(
+            f"Crawl: {len(sessions)} session(s) found, {sum(sessions.values())} done;"
+            f" {len(todo)} to do in shard {shard[0]}/{shard[1]}"
+        )
+
+        # Don't start too many sessions at once; each loads all its presentations
+        in_flight = asyncio.Semaphore(2 * fetch_concurrency)
+        n_done = 0
+
+        async def crawl_session(url):
+            nonlocal n_done
+            async with in_flight:
+                try:
+                    # Raises unless the session's note and all of its presentations'
+                    # notes are written (or were already)
+                    await self.process_session(url)
+                except Exception as e:
+                    # Not marked done, so it's tried again when the crawl is resumed
+                    await asyncio.to_thread(self.failed, url, e)
+                    return
+            await asyncio.to_thread(checkpoint.session_done, url)
+            n_done += 1
+            if n_done % 10 == 0:
+                print(f"Crawl: {n_done}/{len(todo)} session(s) done")
+
+        await asyncio.gather(*(crawl_session(url) for url in todo))
+        print(f"Crawl: {n_done}/{len(todo)} session(s) done")
+
+    async def group_by_session(self, urls):
+        """
+        Group URLs by their session, as {normalized session URL: [URLs]}, loading
+        presentations given to find their sessions. URLs already done (see --resume)
+        and presentations that fail to load are left out.
+        """
+        groups = {}
+
+        async def add(url):
+            if journal:
+                if journal.is_done(url):
+                    journal.skip()
+                    return
+                await asyncio.to_thread(journal.pending, url)
+            try:
+                session_url = await self.get_session_url(normalize_url(url))
+            except Exception as e:
+                await asyncio.to_thread(self.failed, url, e)
+                return
+            groups.setdefault(session_url, []).append(url)
+
+        await asyncio.gather(*(add(url) for url in dict.fromkeys(urls)))
+        return groups
+
+    def plan_summary(self):
+        """
+        Compare the number of pages loaded to how many would have been without
+        planning: for each URL given, its presentation (if any), then its session
+        and all of the session's presentations
+        """
+        session_of = {}
+        for session_url, paper_urls in self.plan.items():
+            session_of[session_url] = session_url
+            for url in paper_urls:
+                session_of[url] = session_url
+        naive_loads = 0
+        for url, count in self.input_counts.items():
+            session_url = session_of.get(url, url)
+            naive_loads += count * int(url != session_url)
+            naive_loads += count * (1 + self.n_children.get(session_url, 0))
+        n_papers = sum(len(papers) for papers in self.plan.values())
+        return (
+            f"Planned {len(self.plan)} session(s) from"
+            f" {sum(self.input_counts.values())} URL(s) ({n_papers} presentation"
+            f" URL(s)). Loaded {len(self.loads)} page(s); deduplication saved"
+            f" {max(0, naive_loads - len(self.loads))} page load(s)"
+        )
+
+    async def process_item(self, url):
+        """
+        Process a URL, recording its progress in the journal. If it fails, the error is
+        recorded and the run carries on.
+        """
+        if journal:
+            if journal.is_done(url):
+                journal.skip()
+                return
+            if normalize_url(url) in self.items:
+                # Already being processed; this just counts it
+                await self.process_url(url)
+                return
+            self.items.add(normalize_url(url))
+            await asyncio.to_thread(journal.pending, url)
         try:
-            get_session(session_url, tz, browser, has_abstract=True)
+            await self.process_url(url)
         except Exception as e:
-            raise RuntimeError(f"Failed to get session from {url}") from e
+            await asyncio.to_thread(self.failed, url, e)
+        else:
+            self.done.append(normalize_url(url))
+            if journal:
+                await asyncio.to_thread(journal.done, url)
+
+    async def process_urls(self, urls):
+        """
+        Process URLs from any iterable, e.g. parse_ics() reading a .ics file. Each URL
+        starts being processed as soon as it's read.
+        """
+        # Don't read too far ahead of what's being processed
+        in_flight = asyncio.Semaphore(4 * fetch_concurrency)
+        tasks = []
+        urls = iter(urls)
+        while True:
+            url = await asyncio.to_thread(next, urls, None)
+            if url is None:
+                break
+            await in_flight.acquire()
+            task = asyncio.ensure_future(self.process_item(url))
+            task.add_done_callback(lambda _: in_flight.release())
+            tasks.append(task)
+        await asyncio.gather(*tasks)
+        print(self.plan_summary())
+
+
+class LockedLog:
+    """
+    A log file that threads can print to at once. A plain file isn't safe for that:
+    concurrent writes can garble its buffer.
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self.lock = Lock()
+
+    def write(self, text):
+        with self.lock:
+            return self.log.write(text)
+
+    def flush(self):
+        with self.lock:
+            self.log.flush()
+
+
+def run_worker(launch_dir, worker, urls, offline_only):
+    """
+    Process URLs in a worker process (see run_processes()), printing to a log file.
+    Returns what the worker did.
+    """
+    global offline
+    chdir(launch_dir)
+    read_settings()
+    offline = offline_only
+    tz = get_tz(thisYear)
+    log_file = path.abspath(f".agu-notes-worker-{worker}.log")
+    with open(log_file, "w", encoding="utf-8") as log, redirect_stdout(LockedLog(log)):
+        with get_browser_manager(tz) as manager:
+            pipeline = Pipeline(tz)
+            pipeline.run(pipeline.process_urls, urls)
+            print(manager.summary())
+            if get_page_cache():
+                print(get_page_cache().summary())
+            if readiness_times:
+                print(readiness_summary())
+            if get_archive_pack():
+                get_archive_pack().flush()
+                print(get_archive_pack().summary())
+            if people_notes:
+                print(get_people_index().summary())
+        if get_tracer():
+            worker_profile_file = profile_file.replace(".json", f"-{worker}.json")
+            get_tracer().save(worker_profile_file)
+            print(get_tracer().summary())
+            print(f"Timings saved to '{worker_profile_file}'")
+    return {
+        "worker": worker,
+        "log_file": log_file,
+        "note_counts": dict(note_counts),
+        "launches": manager.launches,
+        "done": pipeline.done,
+        "failures": pipeline.failures,
+    }
+
+
+def run_processes(urls, tz, launch_dir):
+    """
+    Split URLs between processes worker processes (each with its own browser) by
+    session, so that every session is gotten by just one of them, then report on what
+    they all did
+    """
+    pipeline = Pipeline(tz)
+    with get_browser_manager(tz) as manager:
+        groups = pipeline.run(pipeline.group_by_session, urls)
+    # Workers get the sessions rather than the URLs given, so presentations the
+    # grouping loaded aren't loaded again just to find their sessions. Biggest groups
+    # first, each to the process with the fewest sessions so far.
+    shards = [[] for _ in range(processes)]
+    for session_url in sorted(groups, key=lambda url: len(groups[url]), reverse=True):
+        min(shards, key=len).append(session_url)
+    shards = [shard for shard in shards if shard]
+    print(
+        f"Splitting {len(groups)} session(s) between {len(shards)} processes; see"
+        f" .agu-notes-worker-*.log for each one's progress"
+    )
+
+    results = []
+    # Spawned rather than forked, which isn't safe with threads (and isn't available
+    # everywhere)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(len(shards), mp_context=context) as executor:
+        futures = [
+            executor.submit(run_worker, launch_dir, worker, shard, offline)
+            for worker, shard in enumerate(shards, 1)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            print(
+                f"Process {result['worker']} done: {len(result['done'])} session(s)"
+                f" done, {len(result['failures'])} URL(s) failed"
+            )
+            results.append(result)
+
+    # One report for all the processes
+    launches = manager.launches
+    for result in sorted(results, key=lambda r: r["worker"]):
+        print(f"\n===== Process {result['worker']} =====")
+        with open(result["log_file"], encoding="utf-8") as f:
+            print(f.read(), end="")
+        note_counts.update(result["note_counts"])
+        launches += result["launches"]
+        failures = result["failures"]
+        for url, error in failures.items():
+            print(f"Failed: {url}\n{INDENT}{error}")
+            if journal:
+                journal.failed(url, RuntimeError(error))
+        if not journal:
+            continue
+        # Each URL given is done if its session was, unless it failed itself
+        for session_url in result["done"]:
+            for url in groups[session_url]:
+                if normalize_url(url) not in failures:
+                    journal.done(url)
+        for session_url, error in failures.items():
+            for url in groups.get(session_url, []):
+                if normalize_url(url) not in failures:
+                    journal.failed(url, RuntimeError(error))
+    print("\n===== All processes =====")
+    print(f"{launches} browser launch(es) in {len(shards)} processes")
+    print(note_summary())
+
+
+def parse_shard(text):
+    """
+    Parse --shard's "i/n" into (i, n)
+    """
+    try:
+        i, n = (int(x) for x in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected i/n, e.g. 1/4, not {text}")
+    if not 1 <= i <= n:
+        raise argparse.ArgumentTypeError(f"Shard must be from 1/{n} to {n}/{n}")
+    return i, n
+
+
+def plan_record(url):
+    """
+    Like lookup_record(), but None for a page that isn't cached even with --offline
+    (where the cache raises instead)
+    """
+    try:
+        return lookup_record(url)
+    except RuntimeError:
+        return None
+
+
+def print_plan(urls):
+    """
+    Print what a run would do with the given URLs, without loading any pages: the
+    sessions it would get and, for pages already read (in the cache or incremental
+    state), where their notes would go
+    """
+    plan = {}  # Normalized session URL: [presentation URLs given]
+    unplanned = []  # Presentation URLs whose session isn't known without loading them
+    n_urls = 0
+    for url in urls:
+        n_urls += 1
+        url = normalize_url(url)
+        if url.split("/")[-2] == "Session":
+            plan.setdefault(url, [])
+            continue
+        record = plan_record(url)
+        if record is None:
+            if url not in unplanned:
+                unplanned.append(url)
+            continue
+        paper_urls = plan.setdefault(normalize_url(record["parent_url"]), [])
+        if url not in paper_urls:
+            paper_urls.append(url)
+
+    n_notes = 0
+    for session_url, paper_urls in plan.items():
+        print(f"Session: {session_url}")
+        for url in paper_urls:
+            print(f"{INDENT}Presentation given: {url}")
+        record = plan_record(session_url)
+        if record is None:
+            print(f"{INDENT}(Not cached, so where its notes go isn't known)")
+            continue
+        fields = session_fields(session_url, record)
+        dirname, output_file = session_note_path(fields)
+        print(f"{INDENT}Note: '{output_file}'")
+        n_notes += 1
+        for row in fields["rows"]:
+            if "url" in row:
+                print(f"{2*INDENT}'{path.join(dirname, row['filename'])}.md'")
+                n_notes += 1
+    for url in unplanned:
+        print(f"Presentation (not cached, so its session isn't known): {url}")
+    print(
+        f"Plan: {n_urls} URL(s) -> {len(plan)} session(s) and {len(unplanned)}"
+        f" presentation(s) of unknown session; {n_notes} known note(s)"
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Download AGU sessions as notes for Obsidian"
+    )
+    parser.add_argument(
+        "urls",
+        nargs="*",
+        metavar="URL",
+        help="Session or presentation URLs, or a single .ics file",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Only read pages from the cache, never from the web",
+    )
+    parser.add_argument(
+        "--crawl",
+        metavar="MEETING",
+        help=(
+            "Get every session of a meeting, e.g. agu25 (or starting from a program"
+            " listing URL). Stop any time; running it again carries on."
+        ),
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="i/n",
+        type=parse_shard,
+        default=(1, 1),
+        help="With --crawl, only get the ith of n shares of the sessions",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Carry on from the last run: skip URLs it finished, and (if no URLs are"
+            " given) retry those it didn't"
+        ),
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Only print what would be downloaded and where, without downloading it",
+    )
+    parser.add_argument(
+        "--restore",
+        metavar="NOTE",
+        help="Restore an archived version of a note (with archive = pack)",
+    )
+    parser.add_argument(
+        "--restore-version",
+        metavar="YYYYmmddHHMMSS",
+        help="With --restore, which version to restore (default: the latest)",
+    )
+    args = parser.parse_args()
+    if not args.urls and not (args.restore or args.crawl or args.resume):
+        parser.error("Give at least one URL or .ics file")
+    if args.crawl and (args.urls or args.plan):
+        parser.error("--crawl doesn't take URLs or --plan")
+    return args
+
+
+def restore_note(note_file, archived=None):
+    """
+    Restore an archived version of a note, given relative to the output directory
+    (which may be a note that's since been deleted)
+    """
+    pack = get_archive_pack()
+    if not (pack and pack.versions(note_file)) and not path.exists(note_file):
+        raise RuntimeError(f"Note '{path.abspath(note_file)}' not found")
+    if not pack:
+        archive_zip = path.abspath(note_sibling(note_file, " ARCHIVE.zip"))
+        raise RuntimeError(
+            f"--restore needs archive = pack; old versions of this note are in"
+            f" '{archive_zip}'"
+        )
+    for version, _ in pack.versions(note_file):
+        print(f"{INDENT}Archived version: {version}")
+    print(f"Restored to '{path.abspath(pack.restore(note_file, archived))}'")
+
+
+def main():
+    global offline, journal
+    args = parse_args()
+    offline = args.offline
+    launch_dir = getcwd()
+    read_settings()  # Changes to the output directory
+    if args.restore:
+        # The note is given relative to where we were run, but the pack lists notes
+        # relative to the output directory
+        note_file = path.relpath(path.join(launch_dir, args.restore))
+        restore_note(note_file, args.restore_version)
+        return
+    tz = get_tz(thisYear)
+    get_tracer()  # So that spans are timed from the start of the run
+
+    # Make sure browsers get quit if we're killed (Ctrl-C already raises
+    # KeyboardInterrupt)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    url_list = args.urls
+    if len(url_list) == 1 and url_list[0].endswith(".ics"):
+        url_list = parse_ics(url_list[0], tz)
+    elif any(u.endswith(".ics") for u in url_list):
+        raise RuntimeError("Can only read .ics file if it's the only argument given")
+    if args.plan:
+        print_plan(url_list)
+        return
+    if not args.crawl:
+        journal = Journal(journal_file, resume=args.resume)
+        if args.resume:
+            unfinished = journal.unfinished()
+            print(f"Resuming {len(unfinished)} unfinished URL(s) from '{journal_file}'")
+            url_list = itertools.chain(unfinished, url_list)
+
+    if processes > 1 and not args.crawl:
+        run_processes(url_list, tz, launch_dir)
+        if journal and journal.summary():
+            print(journal.summary())
+        if journal and journal.failures:
+            sys.exit(1)
+        return
+
+    with get_browser_manager(tz) as manager:
+        pipeline = Pipeline(tz)
+        if args.crawl:
+            checkpoint = CrawlCheckpoint(crawl_checkpoint_file(args.crawl))
+            pipeline.run(pipeline.crawl, args.crawl, checkpoint, args.shard)
+        else:
+            pipeline.run(pipeline.process_urls, url_list)
+        print(manager.summary())
+        print(note_summary())
+        if get_page_cache():
+            print(get_page_cache().summary())
+        if readiness_times:
+            print(readiness_summary())
+        if get_state_store():
+            print(get_state_store().summary())
+        if get_archive_pack():
+            get_archive_pack().flush()
+            print(get_archive_pack().summary())
+        if people_notes:
+            print(get_people_index().summary())
+        if get_fetch_policy().n_failures or get_fetch_policy().throttle_seconds:
+            print(get_fetch_policy().summary())
+    if get_tracer():
+        get_tracer().save(profile_file)
+        print(get_tracer().summary())
+        print(f"Timings saved to '{profile_file}'")
+    if journal and journal.summary():
+        print(journal.summary())
+    if journal and journal.failures:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # For processes = N in the binary
     main()
@@ -0,0 +1,278 @@
+"""
+Pages for the benchmark's stand-in confex server, laid out like the real meeting app's
+Session, Paper and program listing pages (only the parts that agu-notes-from-url reads).
+"""
+
+from html import escape
+
+MEETING = "/agu/agu25/meetingapp.cgi"
+SLOT_DATE = "Monday, 15 December 2025"
+AFFILIATIONS = [
+    "University of Colorado Boulder",
+    "NASA Goddard Space Flight Center",
+    "Université Grenoble Alpes",
+    "Universidad Nacional Autónoma de México",
+    "Lamont–Doherty Earth Observatory",
+]
+ABSTRACT = (
+    "Soil moisture–atmosphere feedbacks modulate the frequency of heat extremes. "
+    "We combine flux-tower observations with a land-surface model ensemble to "
+    "quantify how the sensitivity of evapotranspiration to soil water changes "
+    "across climate regimes.\n"
+    "Our results suggest that current models overestimate the strength of the "
+    "feedback in semi-arid regions by a factor of 1.5–2."
+)
+
+
+# What the real pages load besides their HTML: a stylesheet (with a web font), a logo,
+# a photo for each person and an analytics script. Only the stylesheet and script
+# change what a browser shows.
+STATIC = "/static"
+HEAD = (
+    f'<link rel="stylesheet" href="{STATIC}/meetingapp.css">'
+    f'<script src="{STATIC}/analytics.js"></script>'
+)
+LOGO = f'<img class="logo" src="{STATIC}/logo.png" alt="">'
+
+
+def assets():
+    """
+    The files linked from every page's HEAD and LOGO (and photos), as
+    {path: (content type, content)}
+    """
+    css = (
+        "@font-face { font-family: Meeting; src: url(font.woff2) format('woff2'); }\n"
+        "body { font-family: Meeting, sans-serif; }\n"
+        ".logo, .photo { width: 64px; }\n"
+    )
+    result = {
+        f"{STATIC}/meetingapp.css": ("text/css", css.encode()),
+        f"{STATIC}/analytics.js": ("text/javascript", b"window.analytics = [];"),
+        f"{STATIC}/font.woff2": ("font/woff2", bytes(60_000)),
+        f"{STATIC}/logo.png": ("image/png", bytes(30_000)),
+    }
+    for i in range(len(AFFILIATIONS) * 2):
+        result[f"{STATIC}/photo{i}.jpg"] = ("image/jpeg", bytes(80_000))
+    return result
+
+
+def photo(i):
+    return f'<img class="photo" src="{STATIC}/photo{i % (len(AFFILIATIONS) * 2)}.jpg">'
+
+
+def person(i):
+    return f"Author Number{i}", AFFILIATIONS[i % len(AFFILIATIONS)]
+
+
+def session_url(session_id):
+    return f"{MEETING}/Session/{session_id}"
+
+
+def paper_url(paper_id):
+    return f"{MEETING}/Paper/{paper_id}"
+
+
+def session_page(session):
+    """
+    HTML for a Session page. session is a dict from SESSIONS.
+    """
+    parts = [
+        f"<html><head><title>Session</title>{HEAD}</head>"
+        f'<body>{LOGO}<div class="content">'
+    ]
+    if session["code"]:
+        parts.append(f'<div class="finalNumber">{session["code"]}</div>')
+        title = f'{session["code"]} - {session["title"]}'
+    else:
+        title = session["title"]
+    parts.append(f'<div class="field_GoodType">{escape(session["type"])}</div>')
+    parts.append(f'<h2 class="favoriteItem">{escape(title)}</h2>')
+    parts.append(
+        '<div class="field_ParentList_SlotData">'
+        f'<div class="SlotDate">{SLOT_DATE}</div>'
+        f'<div class="SlotTime">{session["time"]}</div>'
+        f'<div class="propertyInfo"> {escape(session["location"])}</div>'
+        "</div>"
+    )
+    parts.append(f'<div class="field_SubTitle">{escape(ABSTRACT)}</div>')
+    parts.append('<div class="field_ChildList_Role">')
+    for i in range(session["n_leaders"]):
+        name, affil = person(i)
+        parts.append(
+            f'<div class="RoleListItem">{photo(i)}'
+            f'<a href="{MEETING}/Person/{i}">{escape(name)}</a>'
+            f'<div class="Affiliation">{escape(affil)}</div>'
+            "</div>"
+        )
+    parts.append("</div>")
+    if session["papers"] is not None:
+        parts.append('<div class="field_ChildList_PaperSlot">')
+        for paper in session["papers"]:
+            parts.append('<div class="entryInformation">')
+            if paper["time"]:
+                parts.append(f'<div class="SlotTime">{paper["time"]}</div>')
+            if paper["number"]:
+                parts.append(f'<div class="SessionListNumber">{paper["number"]}</div>')
+            title = escape(paper["title"])
+            if paper["number"]:
+                title = f'{paper["number"]} {title}'
+            parts.append(
+                f'<div class="Title"><a href="{paper_url(paper["id"])}">{title}</a>'
+                f'<div class="presenter">{escape(paper["presenter"])}</div></div>'
+            )
+            parts.append("</div>")
+        parts.append("</div>")
+    parts.append("</div></body></html>")
+    return "".join(parts)
+
+
+def paper_page(session, paper):
+    """
+    HTML for a Paper page: paper is one of session["papers"]
+    """
+    if session["code"]:
+        parent_text = f'{session["code"]} - {session["title"]}'
+    else:
+        parent_text = session["title"]
+    title = escape(paper["title"])
+    if paper["number"]:
+        title = f'{paper["number"]} {title}'
+    parts = [
+        f"<html><head><title>Paper</title>{HEAD}</head>"
+        f'<body>{LOGO}<div class="content">',
+        '<div class="field_ParentList_ParentEntries">'
+        f'<a href="{session_url(session["id"])}">{escape(parent_text)}</a></div>',
+        f'<h2 class="titleContent">{title}</h2>',
+        f'<div class="SlotDate">{SLOT_DATE}</div>',
+        f'<div class="SlotTime">{paper["time"] or session["time"]}</div>',
+        f'<div class="propertyInfo"> {escape(session["location"])}</div>',
+        f'<div class="field_Abstract"><h3>Abstract</h3>{escape(ABSTRACT)}</div>',
+    ]
+    for i in range(paper["n_authors"]):
+        name, affil = person(paper["id"] + i)
+        role = "Primary Presenter" if i == 0 else "Author"
+        parts.append(
+            f'<div class="RoleListItem">{photo(paper["id"] + i)}'
+            f"<div>{role}</div><div>{escape(name)}</div><div>{escape(affil)}</div>"
+            "</div>"
+        )
+    parts.append("</div></body></html>")
+    return "".join(parts)
+
+
+def make_papers(first_id, code, n, poster=False, n_authors=4):
+    papers = []
+    for i in range(n):
+        papers.append(
+            {
+                "id": first_id + i,
+                "number": f"{code}-{i + 1:02d}",
+                "time": "" if poster else f"{8 + i // 4:02d}:{15 * (i % 4):02d}",
+                "title": f"Heat extremes and soil moisture feedbacks: part {i + 1}",
+                "presenter": person(first_id + i)[0],
+                "n_authors": n_authors,
+            }
+        )
+    return papers
+
+
+def make_panel(first_id, code):
+    papers = []
+    for i, role in enumerate(["Moderator", "Panelist", "Panelist", "Panelist"]):
+        name, affil = person(i)
+        papers.append(
+            {
+                "id": first_id + i,
+                "number": None,
+                "time": "",
+                "title": f"{role}: {name}\n{affil}",
+                "presenter": "",
+                "n_authors": 1,
+            }
+        )
+    papers.append(
+        {
+            "id": first_id + 10,
+            "number": f"{code}-01",
+            "time": "14:15",
+            "title": "Panel Discussion",
+            "presenter": "",
+            "n_authors": 1,
+        }
+    )
+    return papers
+
+
+# An oral session, a large poster session, a panel discussion and a keynote (which
+# has no finalNumber)
+SESSIONS = [
+    {
+        "id": 1001,
+        "code": "A11B",
+        "type": "Oral Session",
+        "title": "Land–Atmosphere Interactions I",
+        "time": "08:00 - 10:00",
+        "location": "Moscone West, 3005",
+        "n_leaders": 3,
+        "papers": make_papers(100000, "A11B", 8),
+    },
+    {
+        "id": 1002,
+        "code": "A13E",
+        "type": "Poster Session",
+        "title": "Land–Atmosphere Interactions Posters",
+        "time": "13:40 - 17:30",
+        "location": "Poster Hall A-C",
+        "n_leaders": 4,
+        "papers": make_papers(200000, "A13E", 120, poster=True, n_authors=6),
+    },
+    {
+        "id": 1003,
+        "code": "U21A",
+        "type": "Panel",
+        "title": "Careers in Earth Science: a Panel Discussion",
+        "time": "14:00 - 15:30",
+        "location": "Moscone South, Esplanade 152",
+        "n_leaders": 2,
+        "papers": make_panel(300000, "U21A"),
+    },
+    {
+        "id": 1004,
+        "code": None,
+        "type": "Keynote Lecture",
+        "title": "Frontiers of Earth and Space Science Keynote",
+        "time": "17:00 - 18:00",
+        "location": "Moscone North, Hall E",
+        "n_leaders": 1,
+        "papers": None,
+    },
+]
+
+
+def listing_page(links):
+    parts = ['<html><head><title>Program</title></head><body><div class="content">']
+    for href, text in links:
+        parts.append(f'<div><a href="{href}">{escape(text)}</a></div>')
+    parts.append("</div></body></html>")
+    return "".join(parts)
+
+
+def pages():
+    """
+    Every page the server serves, as {path: HTML}. The meeting's home page links to a
+    program listing for each day, which link to the sessions (for --crawl).
+    """
+    result = {}
+    days = [SESSIONS[:2], SESSIONS[2:]]
+    result[f"{MEETING}/Home/0"] = listing_page(
+        [(f"{MEETING}/Program/{i}", f"Day {i}") for i in range(1, len(days) + 1)]
+    )
+    for i, day in enumerate(days, 1):
+        links = [(session_url(s["id"]), s["title"]) for s in day]
+        links.append((f"{MEETING}/Person/1", "Author Number1"))
+        result[f"{MEETING}/Program/{i}"] = listing_page(links)
+    for session in SESSIONS:
+        result[session_url(session["id"])] = session_page(session)
+        for paper in session["papers"] or []:
+            result[paper_url(paper["id"])] = paper_page(session, paper)
+    return result
@@ -0,0 +1,327 @@
+"""
+Benchmark agu-notes-from-url end to end against a local stand-in for the confex
+meeting app, serving the pages in fixtures.py.
+
+    python bench/run_bench.py --backend http --workers 4
+
+Reports notes written per second, per-page latency percentiles, browser launches, peak
+memory (of this process and every browser it starts), how many of the pages'
+images, fonts, etc. were downloaded and how many URLs failed, and appends them to the
+--output file (JSON lines; by default bench/bench-results.json). The keynote session
+is always read in a browser, so it fails without Chrome, even with --backend http. With --lean-browser both, runs with the stock browser profile and then with
+lean_browser = true, and also reports how much the lean profile saved. With
+--baseline, exits with an error if notes per second dropped by more than --tolerance
+compared to that file's last result with the same settings.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import path
+
+import fixtures
+
+REPO_DIR = path.dirname(path.dirname(path.abspath(__file__)))
+SCRIPT = path.join(REPO_DIR, "agu-notes-from-url.py")
+RESULTS_FILE = path.join(REPO_DIR, "bench", "bench-results.json")
+
+
+def start_server(pages, latency, assets=None, asset_counts=None):
+    """
+    Serve pages ({path: HTML}) after waiting latency seconds each, and assets ({path:
+    (content type, content)}), counting requests for assets in asset_counts
+    """
+    assets = assets or {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path in assets:
+                content_type, body = assets[self.path]
+                if asset_counts is not None:
+                    with lock:
+                        asset_counts["requests"] += 1
+                        asset_counts["bytes"] += len(body)
+            else:
+                html = pages.get(self.path)
+                if latency:
+                    time.sleep(latency)
+                if html is None:
+                    self.send_error(404)
+                    return
+                content_type = "text/html; charset=utf-8"
+                body = html.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    lock = threading.Lock()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class RssSampler(threading.Thread):
+    """
+    Peak memory of this process and everything it starts, using the script's
+    tree_rss_bytes() (so Linux only)
+    """
+
+    def __init__(self, module, interval=0.2):
+        super().__init__(daemon=True)
+        self.module = module
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            rss = self.module.tree_rss_bytes([os.getpid()])
+            if not rss:
+                return
+            self.peak = max(self.peak, rss[os.getpid()])
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def load_script(workdir, settings):
+    """
+    Import agu-notes-from-url, with a settings.ini in workdir for its main() to read
+    """
+    with open(path.join(workdir, "settings.ini"), "w") as f:
+        f.write("[optional]\n")
+        for key, value in settings.items():
+            f.write(f"{key} = {value}\n")
+    os.chdir(workdir)
+    spec = importlib.util.spec_from_file_location("agu_notes_from_url", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def time_pages(module, latencies):
+    """
+    Record how long each page takes from starting to fetch it until it's extracted
+    """
+    fetch_page = module.fetch_page
+    extract_page = module.extract_page
+
+    def timed_fetch_page(*args, **kwargs):
+        start_time = time.perf_counter()
+        page = fetch_page(*args, **kwargs)
+        page["bench_start"] = start_time
+        return page
+
+    def timed_extract_page(page, *args, **kwargs):
+        record = extract_page(page, *args, **kwargs)
+        latencies.append(time.perf_counter() - page["bench_start"])
+        return record
+
+    module.fetch_page = timed_fetch_page
+    module.extract_page = timed_extract_page
+
+
+def run(args, lean_browser=False):
+    pages = fixtures.pages()
+    asset_counts = {"requests": 0, "bytes": 0}
+    server = start_server(
+        pages, args.latency_ms / 1000, fixtures.assets(), asset_counts
+    )
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    urls = [base_url + fixtures.session_url(s["id"]) for s in fixtures.SESSIONS]
+
+    workdir = tempfile.mkdtemp(prefix="agu-notes-bench-")
+    settings = {
+        "output_location": path.join(workdir, "notes"),
+        "year": 2025,
+        "workers": args.workers,
+        "backend": args.backend,
+        "lean_browser": str(lean_browser).lower(),
+    }
+    module = load_script(workdir, settings)
+    latencies = []
+    time_pages(module, latencies)
+
+    sampler = RssSampler(module)
+    sampler.start()
+    sys.argv = [SCRIPT] + urls
+    start_time = time.perf_counter()
+    try:
+        module.main()
+    except SystemExit as e:
+        # main() exits with an error if any URL failed; the rest still count
+        if e.code not in (0, None, 1):
+            raise
+    wall_seconds = time.perf_counter() - start_time
+    sampler.stop()
+    server.shutdown()
+
+    n_notes = 0
+    for dirpath, _, filenames in os.walk(settings["output_location"]):
+        n_notes += sum(1 for f in filenames if f.endswith(".md"))
+    manager = module.browser_manager
+    return {
+        "benchmark": "end_to_end",
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "lean_browser": lean_browser,
+        "workers": args.workers,
+        "latency_ms": args.latency_ms,
+        "sessions": len(urls),
+        "pages": len(latencies),
+        "notes": n_notes,
+        "failures": len(module.journal.failures) if module.journal else 0,
+        "wall_seconds": round(wall_seconds, 3),
+        "notes_per_second": round(n_notes / wall_seconds, 3),
+        "page_seconds": {
+            q: round(percentile(latencies, p), 4)
+            for q, p in [("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0)]
+            if latencies
+        },
+        "browser_launches": manager.launches if manager else 0,
+        "peak_rss_mb": round(sampler.peak / 1024**2, 1) if sampler.peak else None,
+        "asset_requests": asset_counts["requests"],
+        "asset_mb": round(asset_counts["bytes"] / 1024**2, 1),
+    }
+
+
+def baseline_result(baseline_file, result):
+    """
+    The last result in baseline_file run with the same settings as result, if any
+    """
+    same = ["benchmark", "backend", "workers", "latency_ms", "sessions", "pages"]
+    found = None
+    with open(baseline_file) as f:
+        for line in f:
+            if line.strip():
+                previous = json.loads(line)
+                # Results from before lean_browser was added didn't use it (and
+                # ones from before failures were recorded count as none failing)
+                lean_browser = previous.get("lean_browser", False)
+                failures = previous.get("failures", 0)
+                if all(previous.get(k) == result[k] for k in same) and (
+                    (lean_browser, failures)
+                    == (result["lean_browser"], result["failures"])
+                ):
+                    found = previous
+    return found
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "--backend", choices=["selenium", "cdp", "http"], default="selenium"
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--lean-browser",
+        choices=["false", "true", "both"],
+        default="false",
+        help="Whether to use lean_browser = true; both compares the two",
+    )
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=50,
+        help="Delay before the server answers each request (default 50)",
+    )
+    parser.add_argument(
+        "--output",
+        default=RESULTS_FILE,
+        help="File to append the result to, as a line of JSON (default"
+        " bench/bench-results.json)",
+    )
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Largest allowed fractional drop in notes per second (default 0.2)",
+    )
+    return parser.parse_args()
+
+
+def compare_lean_browser(args):
+    """
+    Run with the stock browser profile, then the lean one, and report the difference
+    """
+    results = {}
+    for lean_browser in [False, True]:
+        results[lean_browser] = run(args, lean_browser=lean_browser)
+        print(json.dumps(results[lean_browser], indent=1))
+    stock, lean = results[False], results[True]
+    comparison = {
+        "benchmark": "lean_browser",
+        "date": lean["date"],
+        "backend": args.backend,
+        "workers": args.workers,
+        "latency_ms": args.latency_ms,
+        "page_p50_saved_seconds": round(
+            stock["page_seconds"]["p50"] - lean["page_seconds"]["p50"], 4
+        ),
+        "speedup": round(lean["notes_per_second"] / stock["notes_per_second"], 2),
+        "peak_rss_saved_mb": (
+            round(stock["peak_rss_mb"] - lean["peak_rss_mb"], 1)
+            if stock["peak_rss_mb"] and lean["peak_rss_mb"]
+            else None
+        ),
+        "asset_requests_saved": stock["asset_requests"] - lean["asset_requests"],
+        "asset_mb_saved": round(stock["asset_mb"] - lean["asset_mb"], 1),
+    }
+    print(json.dumps(comparison, indent=1))
+    with open(args.output, "a") as f:
+        for result in [stock, lean, comparison]:
+            f.write(json.dumps(result) + "\n")
+
+
+def main():
+    args = parse_args()
+    args.output = path.abspath(args.output)
+    if args.baseline:
+        args.baseline = path.abspath(args.baseline)
+    if args.lean_browser == "both":
+        compare_lean_browser(args)
+        return
+    result = run(args, lean_browser=args.lean_browser == "true")
+    print(json.dumps(result, indent=1))
+    with open(args.output, "a") as f:
+        f.write(json.dumps(result) + "\n")
+
+    if args.baseline:
+        previous = baseline_result(args.baseline, result)
+        if previous is None:
+            print(f"No result with the same settings in {args.baseline}")
+            return
+        ratio = result["notes_per_second"] / previous["notes_per_second"]
+        print(f"{ratio:.2f}x the notes per second of {previous['date']}")
+        if ratio < 1 - args.tolerance:
+            sys.exit("Throughput regression")
+
+
+if __name__ == "__main__":
+    main()
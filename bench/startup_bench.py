@@ -0,0 +1,90 @@
+"""
+Time how long agu-notes-from-url takes to start up, by timing --plan (which never
+loads a page or starts a browser) on the benchmark's session URLs.
+
+    python bench/startup_bench.py
+
+Reports the median time of --plan and of starting Python with nothing to do, and
+appends them to the --output file (JSON lines; by default bench/bench-results.json,
+wherever it's run from). Exits with an error if --plan takes
+more than --target seconds longer than starting Python.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from os import path
+
+import fixtures
+
+REPO_DIR = path.dirname(path.dirname(path.abspath(__file__)))
+SCRIPT = path.join(REPO_DIR, "agu-notes-from-url.py")
+RESULTS_FILE = path.join(REPO_DIR, "bench", "bench-results.json")
+
+
+def median_seconds(command, runs, cwd):
+    times = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        subprocess.run(command, cwd=cwd, check=True, capture_output=True)
+        times.append(time.perf_counter() - start_time)
+    return sorted(times)[len(times) // 2]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--runs", type=int, default=9)
+    parser.add_argument(
+        "--target",
+        type=float,
+        default=0.25,
+        help="Most seconds --plan may take beyond starting Python (default 0.25)",
+    )
+    parser.add_argument(
+        "--output",
+        default=RESULTS_FILE,
+        help="File to append the result to, as a line of JSON (default"
+        " bench/bench-results.json)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="agu-notes-startup-")
+    with open(path.join(workdir, "settings.ini"), "w") as f:
+        f.write(f"[optional]\nyear = 2025\noutput_location = {workdir}\n")
+    urls = [
+        "https://agu.confex.com" + fixtures.session_url(s["id"])
+        for s in fixtures.SESSIONS
+    ]
+
+    python_seconds = median_seconds([sys.executable, "-c", "pass"], args.runs, workdir)
+    plan_seconds = median_seconds(
+        [sys.executable, SCRIPT, "--plan"] + urls, args.runs, workdir
+    )
+    result = {
+        "benchmark": "startup",
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": args.runs,
+        "python_seconds": round(python_seconds, 3),
+        "plan_seconds": round(plan_seconds, 3),
+        "overhead_seconds": round(plan_seconds - python_seconds, 3),
+        "target_seconds": args.target,
+    }
+    print(json.dumps(result, indent=1))
+    with open(path.abspath(args.output), "a") as f:
+        f.write(json.dumps(result) + "\n")
+    if result["overhead_seconds"] > args.target:
+        sys.exit("Startup is slower than the target")
+
+
+if __name__ == "__main__":
+    main()
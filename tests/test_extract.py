@@ -0,0 +1,209 @@
+"""
+Check that reading pages from their HTML (backend = http) gets the same records as
+reading them in a browser, on the benchmark's fixture pages.
+
+Without a browser, the HTML records are compared with what the browser scripts
+(EXTRACT_*_JS) return by their field names and by the text that innerText gives for
+the fixtures' markup. With Chrome installed, test_browser_records_match also runs the
+scripts on the pages and compares the records directly.
+"""
+
+import importlib.util
+import re
+import sys
+from html import unescape
+from os import path
+
+import pytest
+
+REPO_DIR = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.join(REPO_DIR, "bench"))
+
+import fixtures  # noqa: E402
+
+BASE_URL = "https://agu.confex.com"
+
+
+@pytest.fixture(scope="module")
+def script():
+    spec = importlib.util.spec_from_file_location(
+        "agu_notes_from_url", path.join(REPO_DIR, "agu-notes-from-url.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def inner_text(text):
+    """
+    The text of an element holding just text, as innerText gives it (after .trim())
+    """
+    return " ".join(text.split())
+
+
+def expected_session(session):
+    code = session["code"]
+    title = f'{code} - {session["title"]}' if code else session["title"]
+    papers = []
+    for paper in session["papers"]:
+        paper_title = paper["title"]
+        if paper["number"]:
+            paper_title = f'{paper["number"]} {paper_title}'
+        lines = [inner_text(paper_title), inner_text(paper["presenter"])]
+        papers.append(
+            {
+                "start_time": paper["time"],
+                "number": paper["number"],
+                "title": "\n".join(line for line in lines if line),
+                "url": BASE_URL + fixtures.paper_url(paper["id"]),
+                "cancelled": None,
+            }
+        )
+    return {
+        "final_number": code,
+        "good_type": session["type"],
+        "title": inner_text(title),
+        "slot_date": fixtures.SLOT_DATE,
+        "slot_time": session["time"],
+        "location": inner_text(session["location"]),
+        "subtitle": inner_text(fixtures.ABSTRACT),
+        "leaders": [fixtures.person(i) for i in range(session["n_leaders"])],
+        "papers": papers,
+    }
+
+
+def expected_presentation(session, paper):
+    code = session["code"]
+    parent_text = f'{code} - {session["title"]}' if code else session["title"]
+    title = paper["title"]
+    if paper["number"]:
+        title = f'{paper["number"]} {title}'
+    return {
+        "parent_text": inner_text(parent_text),
+        "parent_url": BASE_URL + fixtures.session_url(session["id"]),
+        "title_text": inner_text(title),
+        "abstract": "Abstract\n" + inner_text(fixtures.ABSTRACT),
+        "pl_summary": None,
+        "authors": [
+            fixtures.person(paper["id"] + i) for i in range(paper["n_authors"])
+        ],
+        "slot_date": fixtures.SLOT_DATE,
+        "slot_time": paper["time"] or session["time"],
+        "location": inner_text(session["location"]),
+    }
+
+
+def js_keys(js, indent):
+    """
+    Field names of the object literals in a browser script, at the given indent
+    """
+    return re.findall(rf"^ {{{indent}}}(\w+):", js, re.MULTILINE)
+
+
+def all_papers():
+    for session in fixtures.SESSIONS:
+        for paper in session["papers"] or []:
+            yield session, paper
+
+
+@pytest.mark.parametrize(
+    "html, expected",
+    [
+        ("<div>a<br>b</div>", "a\nb"),
+        ("<div>a<br><br>b</div>", "a\nb"),
+        ("<div>  a \n\t b  </div>", "a b"),
+        ("<div><span>a</span> <b>b</b></div>", "a b"),
+        ("<div><span>a</span><span>b</span></div>", "ab"),
+        ("<div>a<div>b</div>c</div>", "a\nb\nc"),
+        ("<div><p>a</p><p> </p><p>b</p></div>", "a\nb"),
+        ("<div><script>x()</script><style>p {}</style>a</div>", "a"),
+        ("<div>a &amp; b&nbsp;c</div>", unescape("a & b&nbsp;c")),
+        ("<ul><li>a<li>b</ul>", "a\nb"),
+    ],
+)
+def test_text(script, html, expected):
+    assert script.parse_html(html).text == expected
+
+
+def test_session_fields(script):
+    record = script.extract_session_html(
+        fixtures.session_page(fixtures.SESSIONS[0]), BASE_URL
+    )
+    assert list(record) == js_keys(script.EXTRACT_SESSION_JS, 4)
+    assert list(record["papers"][0]) == js_keys(script.EXTRACT_SESSION_JS, 16)
+
+
+def test_presentation_fields(script):
+    session, paper = next(all_papers())
+    record = script.extract_presentation_html(
+        fixtures.paper_page(session, paper), BASE_URL
+    )
+    assert list(record) == js_keys(script.EXTRACT_PRESENTATION_JS, 4)
+
+
+@pytest.mark.parametrize(
+    "session",
+    [s for s in fixtures.SESSIONS if s["papers"] is not None],
+    ids=lambda s: str(s["id"]),
+)
+def test_session_html(script, session):
+    url = BASE_URL + fixtures.session_url(session["id"])
+    record = script.extract_session_html(fixtures.session_page(session), url)
+    assert record == expected_session(session)
+
+
+def test_session_html_without_papers(script):
+    # The keynote's page has no presentation list, which the HTML can't tell from one
+    # that isn't there yet (so it's read in a browser)
+    (session,) = [s for s in fixtures.SESSIONS if s["papers"] is None]
+    with pytest.raises(ValueError):
+        script.extract_session_html(fixtures.session_page(session), BASE_URL)
+
+
+@pytest.mark.parametrize(
+    "session, paper", list(all_papers()), ids=lambda x: str(x["id"])
+)
+def test_presentation_html(script, session, paper):
+    url = BASE_URL + fixtures.paper_url(paper["id"])
+    record = script.extract_presentation_html(fixtures.paper_page(session, paper), url)
+    assert record == expected_presentation(session, paper)
+
+
+@pytest.fixture(scope="module")
+def browser(script):
+    pytest.importorskip("websocket")
+    script.backend = "cdp"
+    try:
+        browser = script.start_browser("UTC")
+    except Exception as e:
+        pytest.skip(f"No browser ({e})")
+    yield browser
+    browser.quit()
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    from run_bench import start_server
+
+    server = start_server(fixtures.pages(), 0)
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_browser_records_match(script, browser, server_url):
+    for session in fixtures.SESSIONS:
+        url = server_url + fixtures.session_url(session["id"])
+        browser.get(url)
+        record = script.extract_session_selenium(browser)
+        if session["papers"] is None:
+            assert record["papers"] is None
+            continue
+        assert record == script.extract_session_html(
+            fixtures.session_page(session), url
+        )
+    for session, paper in all_papers():
+        url = server_url + fixtures.paper_url(paper["id"])
+        browser.get(url)
+        html = fixtures.paper_page(session, paper)
+        record = script.extract_presentation_selenium(browser)
+        assert record == script.extract_presentation_html(html, url)